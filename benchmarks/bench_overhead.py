@@ -0,0 +1,69 @@
+"""
+Microbenchmark of the fixed per-call overhead of ``read_frame`` on small
+querysets, with and without the cache of resolved frame specifications.
+
+Run from the repository root::
+
+    python benchmarks/bench_overhead.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import runtests  # noqa: E402,F401 configures the test settings
+from django.core.management import call_command  # noqa: E402
+
+from django_pandas.io import read_frame, clear_spec_cache  # noqa: E402
+from django_pandas.tests.models import (  # noqa: E402
+    MyModel, Trader, Security, TradeLog, TradeLogNote)
+
+NUMBER = 2000
+
+
+def setup_data():
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    for i in range(10):
+        MyModel.objects.create(index_col=str(i), col1=i, col2=i / 2.0,
+                               col3=i * 2.0, col4=i)
+    trader = Trader.objects.create(name='Jim Brown')
+    security = Security.objects.create(symbol='ABC', isin='999901')
+    for i in range(10):
+        TradeLog.objects.create(
+            trader=trader, symbol=security,
+            log_datetime='2013-01-01T09:%02d:00' % i, price=30 + i,
+            volume=300, note=TradeLogNote.objects.create(note=str(i)))
+
+
+def report(name, func):
+    clear_spec_cache()
+
+    def cold():
+        clear_spec_cache()
+        func()
+
+    warm_us = timeit.timeit(func, number=NUMBER) / NUMBER * 1e6
+    cold_us = timeit.timeit(cold, number=NUMBER) / NUMBER * 1e6
+    print('%-40s cold %8.1f us   cached %8.1f us' % (name, cold_us, warm_us))
+
+
+def main():
+    setup_data()
+    mymodel = MyModel.objects.all()
+    tradelog = TradeLog.objects.all()
+    report('all fields', lambda: read_frame(mymodel))
+    report('fieldnames + index_col',
+           lambda: read_frame(mymodel, ['col1', 'col2'],
+                              index_col='index_col'))
+    report('spanned fieldnames',
+           lambda: read_frame(tradelog, ['trader__name', 'symbol__isin',
+                                         'note__note', 'price']))
+    report('verbose foreign keys',
+           lambda: read_frame(tradelog, ['trader', 'symbol', 'price']))
+    report('values queryset',
+           lambda: read_frame(mymodel.values('index_col', 'col1')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+Benchmarks of the ``read_frame`` and ``DataFrameQuerySet`` read paths on
+synthetic data in a file based SQLite database.
+
+For each read path the wall time (best of ``--repeat`` runs), the peak
+Python memory allocated while reading (measured with ``tracemalloc`` in a
+separate run, as tracing slows the reads down) and the number of queries
+are reported.
+
+Run from the repository root::
+
+    python benchmarks/bench_read.py                      # 10k rows
+    python benchmarks/bench_read.py --rows 10k 1m 10m
+    python benchmarks/bench_read.py --rows 1m --only verbose --json out.json
+
+The databases are generated once in ``--data-dir`` (``benchmarks/.data``
+by default) and reused by later runs; generating 10M rows takes a few
+minutes and several GB of disk.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SIZES = {'10k': 10000, '100k': 100000, '1m': 1000000, '10m': 10000000}
+INSERT_BATCH_SIZE = 100000
+TRADERS = 100
+SECURITIES = 1000
+SERIES = 10
+
+
+def setup_django(database):
+    import django
+    from django.conf import settings
+
+    settings.configure(
+        INSTALLED_APPS=(
+            'django.contrib.contenttypes',
+            'django_pandas',
+            'django_pandas.tests',
+        ),
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': database,
+            }
+        },
+        DEFAULT_AUTO_FIELD='django.db.models.AutoField',
+    )
+    django.setup()
+
+
+def insert(model, columns, rows):
+    """
+    Inserts the rows of ``columns`` (a dictionary of attribute names to
+    arrays) with ``executemany`` in batches, bypassing model instances
+    """
+    from django.db import connection
+
+    names = list(columns)
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        connection.ops.quote_name(model._meta.db_table),
+        ', '.join(connection.ops.quote_name(name) for name in names),
+        ', '.join(['%s'] * len(names)))
+    with connection.cursor() as cursor:
+        for start in range(0, rows, INSERT_BATCH_SIZE):
+            stop = min(start + INSERT_BATCH_SIZE, rows)
+            cursor.executemany(sql, list(zip(
+                *[columns[name][start:stop].tolist() for name in names])))
+
+
+def timestamps(rows, step='s'):
+    """
+    Returns ``rows`` consecutive timestamps in the format Django stores them
+    in SQLite
+    """
+    start = np.datetime64('2000-01-01T00:00:00')
+    values = start + np.arange(rows).astype('timedelta64[%s]' % step)
+    return np.char.replace(values.astype(str), 'T', ' ')
+
+
+def generate(rows):
+    """
+    Fills the test models with ``rows`` rows each (``TRADERS`` traders and
+    ``SECURITIES`` securities)
+    """
+    from django.core.management import call_command
+    from django.db import transaction
+    from django_pandas.tests.models import (
+        Trader, Security, TradeLogNote, TradeLog, PivotData, LongTimeSeries,
+        WideTimeSeries, MyModelChoice)
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    rng = np.random.default_rng(0)
+    ids = np.arange(1, rows + 1)
+    with transaction.atomic():
+        insert(Trader, {'name': np.array(['Trader %d' % i
+                                          for i in range(TRADERS)])},
+               TRADERS)
+        insert(Security, {
+            'symbol': np.array(['S%04d' % i for i in range(SECURITIES)]),
+            'isin': np.array(['US%010d' % i for i in range(SECURITIES)]),
+        }, SECURITIES)
+        insert(TradeLogNote, {'note': np.char.add('note ', ids.astype(str))},
+               rows)
+        symbols = rng.integers(1, SECURITIES + 1, rows).astype(object)
+        symbols[rng.random(rows) < 0.1] = None
+        insert(TradeLog, {
+            'trader_id': rng.integers(1, TRADERS + 1, rows),
+            'symbol_id': symbols,
+            'log_datetime': timestamps(rows),
+            'price': rng.random(rows) * 100,
+            'volume': rng.integers(1, 10000, rows),
+            'note_id': ids,
+        }, rows)
+        insert(PivotData, {
+            'row_col_a': rng.choice(['foo', 'bar', 'baz'], rows),
+            'row_col_b': rng.choice(['one', 'two', 'three', 'four'], rows),
+            'row_col_c': rng.choice(['dull', 'shiny'], rows),
+            'value_col_d': rng.standard_normal(rows),
+            'value_col_e': rng.standard_normal(rows),
+            'value_col_f': rng.standard_normal(rows),
+        }, rows)
+        # One value per series and minute so the long storage pivots
+        insert(LongTimeSeries, {
+            'date_ix': timestamps(-(-rows // SERIES), 'm').repeat(SERIES)[
+                :rows],
+            'series_name': np.tile(['series %d' % i for i in range(SERIES)],
+                                   -(-rows // SERIES))[:rows],
+            'value': rng.standard_normal(rows),
+        }, rows)
+        insert(WideTimeSeries, dict(
+            [('date_ix', timestamps(rows, 'm'))] +
+            [('col%d' % i, rng.standard_normal(rows)) for i in range(1, 5)]),
+            rows)
+        insert(MyModelChoice, {
+            'col1': rng.integers(1, 4, rows),
+            'col2': rng.standard_normal(rows),
+        }, rows)
+
+
+def read_paths():
+    """
+    Returns the benchmarked read paths as (name, callable) pairs
+    """
+    from django_pandas.io import read_frame
+    from django_pandas.tests.models import (
+        TradeLog, PivotData, LongTimeSeries, WideTimeSeries, MyModelChoice)
+
+    tradelog = TradeLog.objects.all()
+    pivot = {'values': 'value_col_d', 'rows': ['row_col_a', 'row_col_b'],
+             'cols': ['row_col_c']}
+    return [
+        ('values queryset', lambda: read_frame(
+            tradelog.values('log_datetime', 'price', 'volume'))),
+        ('full model', lambda: read_frame(tradelog, verbose=False)),
+        ('full model, cursor engine', lambda: read_frame(
+            tradelog, verbose=False, engine='cursor')),
+        ('full model, auto dtypes', lambda: read_frame(
+            tradelog, verbose=False, dtypes='auto')),
+        ('spanned fields', lambda: read_frame(
+            tradelog, ['trader__name', 'symbol__isin', 'note__note',
+                       'price'])),
+        ('verbose foreign keys', lambda: read_frame(
+            tradelog, ['trader', 'symbol', 'price'])),
+        ('verbose foreign key, pandas_label', lambda: read_frame(
+            tradelog, ['symbol', 'price'])),
+        ('choices', lambda: read_frame(MyModelChoice.objects.all())),
+        ('pivot', lambda: PivotData.objects.to_pivot_table(**pivot)),
+        ('pivot, pushdown', lambda: PivotData.objects.to_pivot_table(
+            pushdown=True, **pivot)),
+        ('wide timeseries', lambda: WideTimeSeries.objects.to_timeseries(
+            index='date_ix', freq='D', agg_kwargs={'func': 'sum'})),
+        ('wide timeseries, pushdown',
+         lambda: WideTimeSeries.objects.to_timeseries(
+             index='date_ix', freq='D', agg_kwargs={'func': 'sum'},
+             pushdown=True)),
+        ('long timeseries', lambda: LongTimeSeries.objects.to_timeseries(
+            index='date_ix', storage='long', pivot_columns='series_name',
+            values='value')),
+        ('long timeseries, categorize',
+         lambda: LongTimeSeries.objects.to_timeseries(
+             index='date_ix', storage='long', pivot_columns='series_name',
+             values='value', categorize=['series_name'])),
+        ('long frame', lambda: LongTimeSeries.objects.to_dataframe(
+            ['series_name', 'value'])),
+        ('long frame, categorize', lambda: LongTimeSeries.objects.to_dataframe(
+            ['series_name', 'value'], categorize=100)),
+    ]
+
+
+def measure(func, repeat):
+    """
+    Returns the best wall time of ``repeat`` calls of ``func``, the peak
+    memory traced during one more call and its number of queries
+    """
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django_pandas.utils import get_label_cache
+
+    def call():
+        # Start every run with cold label caches
+        get_label_cache().clear()
+        cache.clear()
+        func()
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(seconds), peak, len(queries)
+
+
+def run(rows, data_dir, repeat, only=None):
+    database = os.path.join(data_dir, 'bench_%d.sqlite3' % rows)
+    exists = os.path.exists(database)
+    setup_django(database)
+    if not exists:
+        print('generating %d rows in %s' % (rows, database), file=sys.stderr)
+        start = time.perf_counter()
+        generate(rows)
+        print('generated in %.1fs' % (time.perf_counter() - start),
+              file=sys.stderr)
+
+    results = []
+    for name, func in read_paths():
+        if only and not any(word in name for word in only):
+            continue
+        seconds, peak, queries = measure(func, repeat)
+        results.append({'rows': rows, 'path': name, 'seconds': seconds,
+                        'peak_bytes': peak, 'queries': queries})
+        print('%10d  %-36s %10.3f s %10.1f MB %6d queries' % (
+            rows, name, seconds, peak / 2 ** 20, queries))
+        sys.stdout.flush()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', nargs='+', default=['10k'],
+                        help='row counts: %s or integers' % ', '.join(SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+',
+                        help='only run the read paths containing these words')
+    parser.add_argument('--data-dir',
+                        default=os.path.join(ROOT, 'benchmarks', '.data'))
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    sizes = [SIZES.get(size.lower()) or int(size) for size in args.rows]
+    if len(sizes) == 1:
+        results = run(sizes[0], args.data_dir, args.repeat, args.only)
+    else:
+        # Django is configured once per process: run each size in its own
+        results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for size in sizes:
+                output = os.path.join(tmp, '%d.json' % size)
+                command = [sys.executable, os.path.abspath(__file__),
+                           '--rows', str(size), '--repeat', str(args.repeat),
+                           '--data-dir', args.data_dir, '--json', output]
+                if args.only:
+                    command += ['--only'] + args.only
+                subprocess.run(command, check=True)
+                with open(output) as f:
+                    results.extend(json.load(f))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
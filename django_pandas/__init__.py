@@ -1 +1,6 @@
+import django
+
 __version__ = '0.6.7'
+
+if django.VERSION < (3, 2):
+    default_app_config = 'django_pandas.apps.DjangoPandasConfig'
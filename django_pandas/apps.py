@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class DjangoPandasConfig(AppConfig):
+    name = 'django_pandas'
+    verbose_name = 'Django Pandas'
+
+    def ready(self):
+        from .utils import register_frame_caches
+        register_frame_caches(
+            getattr(settings, 'DJANGO_PANDAS_FRAME_CACHES', ()))
@@ -1,7 +1,37 @@
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
 import django
+import numpy as np
 import pandas as pd
+from django.core.exceptions import EmptyResultSet, FieldError
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.db.models import Case, Count, F, Field, Max, Min, Value, When
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.query import FlatValuesListIterable
+from django.db.models.signals import class_prepared
+from django.db.models.sql.constants import MULTI
+
+try:
+    from asgiref.sync import sync_to_async
+except ImportError:  # pragma: no cover (Django < 3.0)
+    sync_to_async = None
 
-from .utils import update_with_verbose, get_related_model
+from .utils import (update_with_verbose, get_related_model, get_field_dtype,
+                    is_verbose_field, string_dtype, cast_series,
+                    get_label_expression, cached_update_functions,
+                    get_pks_from_labels, force_text, INTEGER_FIELDS,
+                    get_arrow_type, arrow_labels, get_downcast_dtype,
+                    STRING_FIELDS)
+from .signals import frame_timer, NULL_TIMER
 
 FieldDoesNotExist = (
     django.db.models.fields.FieldDoesNotExist
@@ -10,6 +40,12 @@ FieldDoesNotExist = (
 )
 
 
+#: Maximum number of resolved frame specifications kept by ``frame_spec``
+SPEC_CACHE_SIZE = 1024
+
+_spec_cache = {}
+
+
 def to_fields(qs, fieldnames):
     for fieldname in fieldnames:
         model = qs.model
@@ -17,21 +53,36 @@ def to_fields(qs, fieldnames):
             try:
                 field = model._meta.get_field(fieldname_part)
             except FieldDoesNotExist:
-                try:
-                    rels = model._meta.get_all_related_objects_with_model()
-                except AttributeError:
-                    field = fieldname
-                else:
-                    for relobj, _ in rels:
-                        if relobj.get_accessor_name() == fieldname_part:
-                            field = relobj.field
-                            model = field.model
-                            break
+                # Not a field, e.g. an annotation
+                field = fieldname
+                break
             else:
                 model = get_related_model(field)
         yield field
 
 
+def clear_spec_cache(**kwargs):
+    """
+    Empties the caches of resolved fields, verbose update functions and
+    label expressions. This happens automatically when models are
+    (re)registered or ``INSTALLED_APPS`` changes.
+    """
+    _spec_cache.clear()
+    cached_update_functions.cache_clear()
+    get_label_expression.cache_clear()
+
+
+def clear_spec_cache_on_apps_change(setting, **kwargs):
+    if setting == 'INSTALLED_APPS':
+        clear_spec_cache()
+
+
+class_prepared.connect(clear_spec_cache,
+                       dispatch_uid='django_pandas_clear_spec_cache')
+setting_changed.connect(clear_spec_cache_on_apps_change,
+                        dispatch_uid='django_pandas_clear_spec_cache')
+
+
 def is_values_queryset(qs):
     if django.VERSION < (1, 9):  # pragma: no cover
         return isinstance(qs, django.db.models.query.ValuesQuerySet)
@@ -42,8 +93,529 @@ def is_values_queryset(qs):
             return False
 
 
+#: Number of rows requested from the DB cursor per ``fetchmany`` call
+#: by the ``cursor`` engine.
+CURSOR_CHUNK_SIZE = 2000
+
+
+def values_names(qs):
+    """
+    Returns the column names of a values queryset in the order the
+    compiled SQL selects them
+    """
+    query = qs.query
+    return (list(query.extra_select) + list(query.values_select) +
+            list(query.annotation_select))
+
+
+def cursor_batches(qs, chunk_size=CURSOR_CHUNK_SIZE):
+    """
+    Runs a values queryset on the raw DB cursor and yields, for every
+    ``fetchmany`` batch, a list holding the values of each selected column.
+
+    Rows are transposed one batch at a time and Django's field converters
+    (e.g. for dates on SQLite) are only applied to the values of the
+    columns that have some.
+    """
+    compiler = qs.query.get_compiler(using=qs.db)
+    chunked_fetch = not connections[qs.db].settings_dict.get(
+        'DISABLE_SERVER_SIDE_CURSORS')
+    converters = None
+    for rows in compiler.execute_sql(MULTI, chunked_fetch=chunked_fetch,
+                                     chunk_size=chunk_size):
+        if converters is None:
+            exprs = [s[0] for s in compiler.select[0:compiler.col_count]]
+            converters = compiler.get_converters(exprs).items()
+        columns = [list(values) for values in zip(*rows)]
+        for pos, (convs, expression) in converters:
+            values = columns[pos]
+            for converter in convs:
+                values = [converter(v, expression, compiler.connection)
+                          for v in values]
+            columns[pos] = values
+        yield columns
+
+
+class CategoricalBuilder(object):
+    """
+    Builds a ``pandas.Categorical`` from batches of values as they are
+    fetched, keeping a dictionary of the distinct values seen so far and
+    an ``int32`` code per row rather than a reference to a string per row.
+
+    If more than ``max_categories`` distinct values are seen the column is
+    not worth encoding: the codes seen so far are decoded and the builder
+    keeps plain values from then on.
+    """
+
+    def __init__(self, max_categories=None):
+        self.max_categories = max_categories
+        self.categories = {}
+        self.codes = []
+        self.values = None
+
+    def extend(self, values):
+        if self.values is not None:
+            self.values.extend(values)
+            return
+        batch = np.empty(len(values), dtype=object)
+        batch[:] = values
+        codes, uniques = pd.factorize(batch)
+        lookup = self.categories.setdefault
+        mapping = np.array([lookup(value, len(self.categories))
+                            for value in uniques] + [-1], dtype=np.int32)
+        # Nulls have code -1 and pick the trailing -1
+        self.codes.append(mapping.take(codes))
+        if self.max_categories is not None and \
+                len(self.categories) > self.max_categories:
+            self.values = self.decode().tolist()
+            self.categories, self.codes = {}, []
+
+    def decode(self):
+        categories = np.empty(len(self.categories) + 1, dtype=object)
+        categories[:-1] = list(self.categories)
+        return categories.take(self.concatenated_codes())
+
+    def concatenated_codes(self):
+        if not self.codes:
+            return np.empty(0, dtype=np.int32)
+        return np.concatenate(self.codes)
+
+    def result(self):
+        """
+        Returns the ``pandas.Categorical``, with sorted categories where the
+        values can be sorted, or the list of values if the builder gave up
+        """
+        if self.values is not None:
+            return self.values
+        categorical = pd.Categorical.from_codes(
+            self.concatenated_codes(),
+            categories=pd.Index(list(self.categories), dtype=object))
+        try:
+            return categorical.reorder_categories(sorted(self.categories))
+        except TypeError:
+            return categorical
+
+
+class ArrayBuilder(object):
+    """
+    Builds a NumPy array of ``dtype`` (``'int64'``, ``'float64'`` or
+    ``'bool'``) from batches of values as they are fetched, so that no
+    Python object is kept per value.
+
+    The column ends up with the dtype ``DataFrame.from_records`` would
+    infer: nulls turn an integer column into ``float64`` with NaN and a
+    boolean column into a list of values, as does any batch that does not
+    fit ``dtype``, and a column of nulls only is a list of None.
+    """
+
+    def __init__(self, dtype):
+        self.dtype = np.dtype(dtype)
+        self.arrays = []
+        self.values = None
+        self.seen = False
+
+    def see(self, values):
+        # Only scanned until the first value which is not null
+        if not self.seen:
+            self.seen = any(value is not None for value in values)
+
+    def extend(self, values):
+        self.see(values)
+        if self.values is None and self.dtype.kind != 'f' and None in values:
+            if self.dtype.kind == 'i':
+                self.dtype = np.dtype('float64')
+                self.arrays = [a.astype(self.dtype) for a in self.arrays]
+            else:
+                self.fall_back()
+        if self.values is None:
+            try:
+                self.arrays.append(np.array(values, dtype=self.dtype))
+                return
+            except (TypeError, ValueError, OverflowError):
+                self.fall_back()
+        self.values.extend(values)
+
+    def fall_back(self):
+        self.values = [value for array in self.arrays
+                       for value in array.tolist()]
+        self.arrays = []
+
+    def result(self):
+        """
+        Returns the array, or a list of values if there are none or they
+        are all null
+        """
+        if self.values is not None:
+            return self.values
+        if not self.seen:
+            return [None] * sum(len(array) for array in self.arrays)
+        return np.concatenate(self.arrays)
+
+
+class DatetimeBuilder(ArrayBuilder):
+    """
+    Builds a ``pandas.DatetimeIndex`` from batches of ``datetime`` values
+    as they are fetched. Aware values are kept as UTC ``datetime64[ns]``
+    and the time zone is restored at the end.
+    """
+
+    def __init__(self):
+        super(DatetimeBuilder, self).__init__('datetime64[ns]')
+        self.tz = None
+
+    def extend(self, values):
+        self.see(values)
+        if self.values is None:
+            try:
+                index = pd.DatetimeIndex(values)
+            except (TypeError, ValueError, OverflowError):
+                self.fall_back()
+            else:
+                if index.tz is not None:
+                    self.tz = index.tz
+                    index = index.tz_convert(None)
+                self.arrays.append(index.values)
+                return
+        self.values.extend(values)
+
+    def fall_back(self):
+        self.values = self.result()
+        if not isinstance(self.values, list):
+            self.values = self.values.tolist()
+        self.arrays = []
+
+    def result(self):
+        if self.values is not None or not self.seen:
+            return super(DatetimeBuilder, self).result()
+        index = pd.DatetimeIndex(np.concatenate(self.arrays))
+        if self.tz is not None:
+            index = index.tz_localize('UTC').tz_convert(self.tz)
+        return index
+
+
+def get_array_builder(field):
+    """
+    Returns a builder making a typed array of the raw values of a model
+    field for the ``cursor`` engine, or None to keep a list of values
+    """
+    if not isinstance(field, Field):
+        return None
+    if field.get_internal_type() in ('ForeignKey', 'OneToOneField'):
+        field = field.target_field
+    internal_type = field.get_internal_type()
+    if internal_type in INTEGER_FIELDS:
+        return ArrayBuilder('int64')
+    if internal_type == 'FloatField':
+        return ArrayBuilder('float64')
+    if internal_type in ('BooleanField', 'NullBooleanField'):
+        return ArrayBuilder('bool')
+    if internal_type == 'DateTimeField':
+        return DatetimeBuilder()
+    return None
+
+
+def cursor_columns(qs, chunk_size=CURSOR_CHUNK_SIZE, categories=None,
+                   fields=None):
+    """
+    Runs a values queryset on the raw DB cursor and returns a dictionary
+    mapping each selected column name to a list of its values. See
+    ``cursor_batches``.
+
+    The columns named in ``categories``, a dictionary of column names to
+    the maximum number of categories (None for no limit), are built as
+    they are fetched with a ``CategoricalBuilder``. The columns of the
+    numeric, boolean and datetime model fields in ``fields``, a dictionary
+    of column names to fields, are built as NumPy arrays instead (see
+    ``ArrayBuilder``).
+    """
+    names = values_names(qs)
+    categories = categories or {}
+    fields = fields or {}
+    columns = []
+    for name in names:
+        if name in categories:
+            columns.append(CategoricalBuilder(categories[name]))
+        else:
+            columns.append(get_array_builder(fields.get(name)) or [])
+    for batch in cursor_batches(qs, chunk_size):
+        for column, values in zip(columns, batch):
+            column.extend(values)
+    return dict((name, column if isinstance(column, list)
+                 else column.result())
+                for name, column in zip(names, columns))
+
+
+def concat_columns(parts):
+    """
+    Concatenates the parts of a column returned by ``cursor_columns``,
+    keeping it categorical, or an array, if every part is
+    """
+    if all(isinstance(part, pd.Categorical) for part in parts):
+        # Categories are merged in the order of the parts, sort them as
+        # CategoricalBuilder does
+        categorical = pd.api.types.union_categoricals(parts, ignore_order=True)
+        try:
+            return categorical.reorder_categories(
+                sorted(categorical.categories))
+        except TypeError:
+            return categorical
+    parts = [part for part in parts if len(part)] or parts[:1]
+    if all(isinstance(part, np.ndarray) for part in parts):
+        return np.concatenate(parts)
+    if all(isinstance(part, pd.DatetimeIndex) and
+           part.dtype == parts[0].dtype for part in parts):
+        return parts[0].append(parts[1:])
+    return [value for part in parts for value in list(part)]
+
+
+def frame_from_columns(columns, fieldnames, column_names=None,
+                       coerce_float=False, dtypes=None):
+    """
+    Builds a DataFrame from the output of ``cursor_columns``. Columns listed
+    in ``dtypes`` are built directly in that dtype, the others get the same
+    dtypes ``DataFrame.from_records`` would infer for the equivalent rows
+    """
+    dtypes = dtypes or {}
+    data = {}
+    for name, fieldname in zip(column_names or fieldnames, fieldnames):
+        values = columns[fieldname]
+        if isinstance(values, (pd.Categorical, np.ndarray, pd.Index)):
+            series = pd.Series(values)
+            if name in dtypes:
+                series = cast_series(series, dtypes[name])
+        elif name in dtypes:
+            series = cast_series(pd.Series(values, dtype=object),
+                                 dtypes[name])
+        else:
+            series = pd.Series(values, dtype=object if not values else None)
+        if coerce_float and series.dtype == object and \
+                pd.api.types.infer_dtype(series, skipna=True) == 'decimal':
+            series = series.astype('float64')
+        data[name] = series
+    return pd.DataFrame(data, columns=list(column_names or fieldnames))
+
+
+def frame_spec(qs, fieldnames=(), index_col=None, column_names=None):
+    """
+    Resolves the field names, model fields and column names used to build
+    a frame from ``qs``.
+
+    The resolved field names and fields only depend on the model and the
+    requested columns so they are cached for subsequent calls.
+    """
+    if fieldnames:
+        fieldnames = tuple(fieldnames)
+        if column_names and index_col is not None and \
+                index_col not in fieldnames:
+            column_names = tuple(column_names) + (index_col,)
+        key = (qs.model, fieldnames, index_col)
+        build = resolve_fieldnames
+    elif is_values_queryset(qs):
+        key = (qs.model, 'values', tuple(qs.query.values_select),
+               tuple(qs.query.annotation_select),
+               tuple(qs.query.extra_select))
+        build = resolve_values_fieldnames
+    else:
+        try:
+            names, defer = qs.query.deferred_loading
+            key = (qs.model, None, tuple(qs.query.annotation_select),
+                   frozenset(names), defer, index_col)
+        except AttributeError:
+            return (), (), column_names
+        build = resolve_model_fieldnames
+
+    try:
+        fieldnames, fields = _spec_cache[key]
+    except KeyError:
+        fieldnames, fields = build(qs, fieldnames, index_col)
+        if len(_spec_cache) >= SPEC_CACHE_SIZE:
+            _spec_cache.clear()
+        _spec_cache[key] = fieldnames, fields
+    return fieldnames, fields, column_names
+
+
+def resolve_fieldnames(qs, fieldnames, index_col=None):
+    fieldnames = tuple(dict.fromkeys(fieldnames))
+    if index_col is not None and index_col not in fieldnames:
+        # Add it to the field names if not already there
+        fieldnames = fieldnames + (index_col,)
+    return fieldnames, tuple(to_fields(qs, fieldnames))
+
+
+def resolve_values_fieldnames(qs, fieldnames=(), index_col=None):
+    if django.VERSION < (1, 9):  # pragma: no cover
+        annotation_field_names = list(qs.query.annotation_select)
+
+        if annotation_field_names is None:
+            annotation_field_names = []
+
+        extra_field_names = qs.extra_names
+        if extra_field_names is None:
+            extra_field_names = []
+
+        select_field_names = qs.field_names
+
+    else:  # pragma: no cover
+        annotation_field_names = list(qs.query.annotation_select)
+        extra_field_names = list(qs.query.extra_select)
+        select_field_names = list(qs.query.values_select)
+
+    fieldnames = select_field_names + annotation_field_names + \
+        extra_field_names
+    fields = [None if '__' in f else qs.model._meta.get_field(f)
+              for f in select_field_names] + \
+        [None] * (len(annotation_field_names) + len(extra_field_names))
+
+    uniq_fields = set()
+    return tuple(zip(
+        *(f for f in zip(fieldnames, fields)
+          if f[0] not in uniq_fields and not uniq_fields.add(f[0]))))
+
+
+def resolve_model_fieldnames(qs, fieldnames=(), index_col=None):
+    """
+    Returns the model fields the queryset loads, honouring ``only()`` and
+    ``defer()``. The primary key and ``index_col`` are always included.
+    """
+    names, defer = qs.query.deferred_loading
+    # Deferred names may span relations, the first part is a local field
+    names = set(name.split(LOOKUP_SEP, 1)[0] for name in names)
+
+    def is_loaded(field):
+        if field.primary_key or field.name == index_col:
+            return True
+        listed = field.name in names or field.attname in names
+        return listed != defer
+
+    fields = tuple(f for f in qs.model._meta.fields if is_loaded(f))
+    annotations = tuple(qs.query.annotation_select)
+    fieldnames = tuple(f.name for f in fields) + annotations
+    # Annotations have no field
+    return fieldnames, fields + (None,) * len(annotations)
+
+
+def frame_schema(fieldnames, fields, column_names=None, verbose=True,
+                 dtypes=None, downcast=False, using=None):
+    """
+    Returns a dictionary mapping column names to the pandas dtype each
+    column is built in.
+
+    ``dtypes`` is either None (leave dtypes to pandas to infer), ``'auto'``
+    (derive the dtypes from the model fields) or a dictionary of column
+    names to dtypes which override the ones derived from the model fields.
+
+    If ``downcast`` is True integer and boolean columns get the narrowest
+    dtype their fields allow on the database ``using`` (see
+    ``get_downcast_dtype``), and so do ``FloatField`` columns, as
+    ``float32``, if it is ``'float'``.
+    """
+    if downcast not in (False, True, 'float'):
+        raise ValueError("downcast must be True, False or 'float'")
+    if dtypes is None and not downcast:
+        return {}
+
+    schema = {}
+    for fieldname, name, field in zip(fieldnames, column_names or fieldnames,
+                                      fields):
+        dtype = None
+        if verbose and is_verbose_field(field):
+            # Choices are already rendered as categoricals
+            if dtypes is not None and not field.choices:
+                dtype = string_dtype()
+        elif downcast:
+            # Spanned fields are empty where a relation is null
+            dtype = get_downcast_dtype(
+                field, floats=downcast == 'float',
+                null=LOOKUP_SEP in fieldname,
+                connection=connections[using] if using else None)
+        if dtype is None and dtypes is not None:
+            dtype = get_field_dtype(field)
+        if dtype is not None:
+            schema[name] = dtype
+    if isinstance(dtypes, dict):
+        schema.update(dtypes)
+    return schema
+
+
+def frame_categories(fieldnames, fields, query_names, column_names=None,
+                     categorize=None):
+    """
+    Returns a dictionary mapping the columns to build as categoricals to
+    the maximum number of categories they may have, None for no limit.
+
+    ``categorize`` is either a list of column names or a number of distinct
+    values: raw string fields and the labels selected by ``select_labels``
+    are then built as categoricals as long as they have at most that many
+    distinct values. ``fields`` and ``query_names`` are the ones returned
+    by ``select_labels``.
+    """
+    if categorize is None or categorize is False:
+        return {}
+    if isinstance(categorize, bool) or \
+            isinstance(categorize, int) and categorize < 1:
+        raise ValueError('categorize must be a list of column names or a '
+                         'positive number of categories')
+    names = column_names or fieldnames
+    if not isinstance(categorize, int):
+        categorize = [categorize] if isinstance(categorize, str) \
+            else list(categorize)
+        unknown = set(categorize).difference(names)
+        if unknown:
+            raise ValueError('Cannot categorize unknown columns: %s'
+                             % ', '.join(sorted(unknown)))
+        return dict.fromkeys(categorize)
+
+    categories = {}
+    for name, fieldname, query_name, field in zip(names, fieldnames,
+                                                  query_names, fields):
+        if is_label_alias(query_name, fieldname):
+            categories[name] = categorize
+        elif isinstance(field, Field) and not field.choices and \
+                field.get_internal_type() in STRING_FIELDS:
+            categories[name] = categorize
+    return categories
+
+
+def is_label_alias(query_name, fieldname):
+    """
+    Returns True if ``query_name`` is the alias ``select_labels`` selects
+    the labels of ``fieldname`` as
+    """
+    return query_name != fieldname and query_name.startswith('pandas_label_')
+
+
+def select_labels(qs, fieldnames, fields):
+    """
+    Annotates ``qs`` with the ``pandas_label`` expressions declared by the
+    models foreign key columns refer to, so their labels are selected in
+    the main query rather than looked up afterwards.
+
+    Returns the annotated queryset, the names to select for each column
+    and the fields which are still to be rendered in Python.
+    """
+    if qs.query.combinator:
+        # Combined queries cannot be annotated, render the labels in Python
+        return qs, fieldnames, fields
+    annotations = {}
+    query_names = list(fieldnames)
+    fields = list(fields)
+    for i, (fieldname, field) in enumerate(zip(fieldnames, fields)):
+        if is_verbose_field(field) and not field.choices:
+            expression = get_label_expression(field, fieldname)
+            if expression is not None:
+                alias = 'pandas_label_%d' % i
+                annotations[alias] = expression
+                query_names[i] = alias
+                fields[i] = None
+    if annotations:
+        qs = qs.annotate(**annotations)
+    return qs, query_names, fields
+
+
 def read_frame(qs, fieldnames=(), index_col=None, coerce_float=False,
-               verbose=True, datetime_index=False, column_names=None):
+               verbose=True, datetime_index=False, column_names=None,
+               engine='default', dtypes=None, parallel=None, backend='numpy',
+               downcast=False, categorize=None):
     """
     Returns a dataframe from a QuerySet
 
@@ -57,10 +629,8 @@ def read_frame(qs, fieldnames=(), index_col=None, coerce_float=False,
     fieldnames: The model field names to use in creating the frame.
          You can span a relationship in the usual Django way
          by using  double underscores to specify a related field
-         in another model
-         You can span a relationship in the usual Django way
-         by using  double underscores to specify a related field
-         in another model
+         in another model. If not given, the fields the QuerySet loads
+         are used, honouring ``only()`` and ``defer()``
 
     index_col: specify the field to use  for the index. If the index
                field is not in the field list it will be appended
@@ -74,87 +644,1252 @@ def read_frame(qs, fieldnames=(), index_col=None, coerce_float=False,
                 the primary keys values.
                 The human readable version of the foreign key field is
                 defined in the ``__unicode__`` or ``__str__``
-                methods of the related class definition
+                methods of the related class definition, unless the
+                related class declares a ``pandas_label`` expression in
+                which case the labels are selected in the main query
 
     datetime_index: specify whether index should be converted to a
                     DateTimeIndex.
 
     column_names: If not None, use to override the column names in the
                   DateFrame
-    """
 
-    if fieldnames:
-        fieldnames = pd.unique(pd.Series(fieldnames))
-        if index_col is not None and index_col not in fieldnames:
-            # Add it to the field names if not already there
-            fieldnames = tuple(fieldnames) + (index_col,)
-            if column_names:
-                column_names = tuple(column_names) + (index_col,)
-        fields = to_fields(qs, fieldnames)
-    elif is_values_queryset(qs):
-        if django.VERSION < (1, 9):  # pragma: no cover
-            annotation_field_names = list(qs.query.annotation_select)
+    engine: ``'default'`` builds the frame from the rows returned by
+            ``values_list``. ``'cursor'`` runs the compiled SQL on the raw
+            DB cursor and builds each column directly from ``fetchmany``
+            batches, as NumPy arrays for integer, float, boolean and
+            datetime fields (see ``cursor_columns``). This avoids holding
+            a tuple per row and an object per numeric value, roughly
+            halving the peak memory of large numeric querysets.
+
+    dtypes: If None the column dtypes are inferred by pandas. If ``'auto'``
+            each column gets a dtype derived from its model field: nullable
+            ``Int64`` and ``boolean``, ``datetime64[ns]`` (UTC when
+            ``USE_TZ`` is set), ``float64`` and ``string``. A dictionary of
+            column names to dtypes can also be passed to override the
+            dtypes derived from the model fields. Columns with a dtype are
+            built directly from the cursor batches as with the ``'cursor'``
+            engine rather than cast from an intermediate frame of objects.
+
+    parallel: If greater than 1, split the QuerySet into up to ``parallel``
+              disjoint primary key ranges and fetch them concurrently, each
+              on its own database connection, before rendering the
+              concatenated rows as usual. Rows come back in primary key
+              range order. QuerySets that cannot be partitioned (sliced,
+              grouped, distinct or combined querysets, querysets ordered
+              by anything but ascending primary key, non-integer primary
+              keys, or reads inside a transaction which other connections
+              could not see) are read serially.
+
+    backend: ``'numpy'`` builds NumPy or object backed columns.
+             ``'pyarrow'`` builds the frame from ``read_arrow`` with
+             ``pandas.ArrowDtype`` columns, so nulls stay nulls instead of
+             becoming NaN or None. ``engine``, ``parallel``, ``downcast``
+             and ``categorize`` do not apply and ``dtypes`` can only be a
+             dictionary of overrides.
+
+    downcast: If True integer and boolean columns get the narrowest dtype
+              their model field allows, from the range of its column on
+              the queryset's database, its validators and its choices,
+              without looking at the data: e.g. ``int16`` for a
+              ``SmallIntegerField`` on PostgreSQL, ``int8`` for integer
+              choices and ``Int16`` or ``boolean`` when the field is
+              nullable. Unbounded columns (all of them on SQLite) stay
+              ``int64`` unless validators or choices narrow them. If
+              ``'float'`` ``FloatField`` columns are also read as
+              ``float32``. ``dtypes`` overrides still apply.
+
+    categorize: Either a list of column names or a number of categories.
+                The raw values of the listed columns, or with a number of
+                the string fields and selected ``pandas_label`` columns
+                having at most that many distinct values, are encoded as
+                ``pandas.Categorical`` while the rows stream in from the
+                cursor: only a dictionary of the distinct values and an
+                integer code per row are kept, so the ``'cursor'`` engine is
+                used. Listed columns rendered in Python are converted once
+                rendered. ``dtypes`` overrides take precedence.
+    """
+    if engine not in ('default', 'cursor'):
+        raise ValueError("engine must be 'default' or 'cursor'")
+    if backend not in ('numpy', 'pyarrow'):
+        raise ValueError("backend must be 'numpy' or 'pyarrow'")
 
-            if annotation_field_names is None:
-                annotation_field_names = []
+    timer = frame_timer(qs, 'read_frame')
+    if backend == 'pyarrow':
+        with timer.phase('fetch'):
+            table = read_arrow(qs, fieldnames, index_col=index_col,
+                               verbose=verbose, column_names=column_names)
+        with timer.phase('build'):
+            df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        if isinstance(dtypes, dict):
+            with timer.phase('dtypes'):
+                df = df.astype(dtypes)
+        return timer.finish(finish_frame(
+            df, (), (), verbose=False, index_col=index_col,
+            datetime_index=datetime_index, timer=timer))
 
-            extra_field_names = qs.extra_names
-            if extra_field_names is None:
-                extra_field_names = []
+    fieldnames, fields, column_names = frame_spec(
+        qs, fieldnames, index_col, column_names)
+    schema = frame_schema(fieldnames, fields, column_names=column_names,
+                          verbose=verbose, dtypes=dtypes, downcast=downcast,
+                          using=getattr(qs, 'db', None))
+    query_names = fieldnames
+    if verbose and hasattr(qs, 'query') and not is_values_queryset(qs):
+        qs, query_names, fields = select_labels(qs, fieldnames, fields)
 
-            select_field_names = qs.field_names
+    categories = frame_categories(fieldnames, fields, query_names,
+                                  column_names=column_names,
+                                  categorize=categorize)
+    overrides = dtypes if isinstance(dtypes, dict) else {}
+    fetch_categories, derived = {}, {}
+    for name, query_name, field in zip(column_names or fieldnames,
+                                       query_names, fields):
+        if name not in categories or name in overrides:
+            continue
+        if verbose and is_verbose_field(field):
+            schema[name] = 'category'
+        else:
+            fetch_categories[query_name] = categories[name]
+            derived[name] = schema.pop(name, None)
 
-        else:  # pragma: no cover
-            annotation_field_names = list(qs.query.annotation_select)
-            extra_field_names = list(qs.query.extra_select)
-            select_field_names = list(qs.query.values_select)
+    raw_schema = dict(schema)
+    if verbose:
+        # Columns rendered as labels are converted after rendering
+        for name, field in zip(column_names or fieldnames, fields):
+            if is_verbose_field(field):
+                raw_schema.pop(name, None)
 
-        fieldnames = select_field_names + annotation_field_names + \
-            extra_field_names
-        fields = [None if '__' in f else qs.model._meta.get_field(f)
-                  for f in select_field_names] + \
-            [None] * (len(annotation_field_names) + len(extra_field_names))
+    if not hasattr(qs, 'query'):
+        engine = 'default'
+    elif fetch_categories or raw_schema:
+        # Categoricals, and columns with a dtype, are built from the cursor
+        # batches rather than from an intermediate frame of objects
+        engine = 'cursor'
+    # Label aliases select strings, not the values of their field
+    fetch_fields = dict(
+        (query_name, field)
+        for query_name, fieldname, field in zip(query_names, fieldnames,
+                                                fields)
+        if not is_label_alias(query_name, fieldname))
+    ranges = partition_ranges(qs, parallel) if parallel else None
+    if ranges:
+        def read_partition(bounds):
+            try:
+                with timer.count_queries():
+                    return fetch_rows(
+                        qs.filter(pk__gte=bounds[0], pk__lt=bounds[1]),
+                        fieldnames, query_names, engine, fetch_categories,
+                        fetch_fields)
+            finally:
+                # Connections are per thread, close the ones opened here
+                connections.close_all()
 
-        uniq_fields = set()
-        fieldnames, fields = zip(
-            *(f for f in zip(fieldnames, fields)
-              if f[0] not in uniq_fields and not uniq_fields.add(f[0])))
+        with timer.phase('fetch'):
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                parts = list(executor.map(read_partition, ranges))
+            if isinstance(parts[0], dict):
+                rows = dict((name, concat_columns([p[name] for p in parts]))
+                            for name in parts[0])
+            else:
+                rows = [rec for part in parts for rec in part]
     else:
+        with timer.phase('fetch'):
+            rows = fetch_rows(qs, fieldnames, query_names, engine,
+                              fetch_categories, fetch_fields)
+
+    with timer.phase('build'):
+        if isinstance(rows, dict):
+            df = frame_from_columns(rows, query_names,
+                                    column_names=column_names or fieldnames,
+                                    coerce_float=coerce_float,
+                                    dtypes=raw_schema)
+        else:
+            # Without field names (e.g. a RawQuerySet) the columns are the
+            # keys of the records
+            df = pd.DataFrame.from_records(
+                rows,
+                columns=column_names or fieldnames or None,
+                coerce_float=coerce_float
+            )
+
+    for name, dtype in derived.items():
+        # Columns with too many categories keep their dtype
+        if dtype is not None and \
+                not isinstance(df[name].dtype, pd.CategoricalDtype):
+            schema[name] = dtype
+
+    return timer.finish(finish_frame(
+        df, fieldnames, fields, verbose=verbose, index_col=index_col,
+        datetime_index=datetime_index, schema=schema, timer=timer))
+
+
+def fetch_rows(qs, fieldnames, query_names, engine='default',
+               categories=None, fields=None):
+    """
+    Runs the query of ``read_frame`` and returns the fetched rows, as a
+    dictionary of columns for the ``'cursor'`` engine and as a list of
+    records otherwise. ``categories`` and ``fields`` only apply to the
+    ``'cursor'`` engine, see ``cursor_columns``, which falls back to
+    records if some names cannot be selected (e.g. properties).
+    """
+    if engine == 'cursor':
         try:
-            fields = qs.model._meta.fields
-            fieldnames = [f.name for f in fields]
-            fieldnames += list(qs.query.annotation_select.keys())
-        except:
+            if not is_values_queryset(qs):
+                qs = qs.values_list(*query_names)
+            return cursor_columns(qs, categories=categories, fields=fields)
+        except FieldError:
             pass
-
     if is_values_queryset(qs):
-        recs = list(qs)
-    else:
+        return list(qs)
+    if not hasattr(qs, 'values_list'):
+        # e.g. a RawQuerySet, whose rows are model instances
+        return [object_to_dict(q, fieldnames) for q in qs]
+    try:
+        return list(qs.values_list(*query_names))
+    except FieldError:
+        pass
+
+    # Names which are neither fields nor annotations, e.g. properties, are
+    # left empty and every other column is still selected in the query
+    positions = []
+    for name in query_names:
         try:
-            recs = list(qs.values_list(*fieldnames))
-        except:
-            if fieldnames:
-                recs = [object_to_dict(q, fieldnames) for q in qs]
-            else:
-                recs = [object_to_dict(q) for q in qs]
+            qs.values_list(name)
+        except FieldError:
+            positions.append(None)
+        else:
+            positions.append(name)
+    selected = list(dict.fromkeys(name for name in positions if name))
+    if not selected:
+        return [(None,) * len(positions) for _ in qs.values_list('pk')]
+    index = dict((name, i) for i, name in enumerate(selected))
+    return [tuple(None if name is None else row[index[name]]
+                  for name in positions)
+            for row in qs.values_list(*selected)]
+
+
+def partition_ranges(qs, parallel):
+    """
+    Returns up to ``parallel`` disjoint ``(low, high)`` primary key bounds,
+    ``low`` inclusive and ``high`` exclusive, covering the rows of
+    ``qs``, or None if the QuerySet cannot be read in partitions
+    """
+    if parallel <= 1 or not hasattr(qs, 'query'):
+        return None
+    query = qs.query
+    # Partitions of grouped, distinct or combined queries do not add up to
+    # the whole query
+    if query.is_sliced or query.group_by is not None or query.distinct or \
+            query.combinator:
+        return None
+    if not is_pk_ordered(qs):
+        return None
+    if connections[qs.db].in_atomic_block:
+        return None
+    if qs.model._meta.pk.get_internal_type() not in INTEGER_FIELDS:
+        return None
+
+    bounds = qs.model._default_manager.using(qs.db).filter(
+        pk__in=qs.order_by().values('pk')).aggregate(
+        low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return None
+    low, high = bounds['low'], bounds['high'] + 1
+    step = -(-(high - low) // parallel)
+    return [(start, min(start + step, high))
+            for start in range(low, high, step)]
+
+
+def is_pk_ordered(qs):
+    """
+    Returns True if the rows of ``qs`` come back in ascending primary key
+    order or in no particular order, as the partitions of a parallel read
+    are concatenated in primary key order
+    """
+    query = qs.query
+    if query.extra_order_by:
+        return False
+    ordering = query.order_by
+    if not ordering and query.default_ordering:
+        ordering = qs.model._meta.ordering
+    pk = qs.model._meta.pk
+    return all(name in ('pk', pk.name, pk.attname) for name in ordering)
+
+
+def get_expression_field(qs, name):
+    """
+    Returns the model field the values ``name`` selects are of: the output
+    field of an annotation or the field a spanned ``values()`` name ends
+    at, or None if it cannot be resolved (e.g. ``extra()`` selects)
+    """
+    annotation = qs.query.annotation_select.get(name)
+    if annotation is not None:
+        try:
+            return annotation.output_field
+        except FieldError:
+            return None
+    field = next(to_fields(qs, [name]))
+    return field if isinstance(field, Field) else None
+
+
+def arrow_spec(qs, fieldnames=(), index_col=None, verbose=True,
+               column_names=None):
+    """
+    Resolves the values queryset ``arrow_batches`` runs, the names and
+    fields of its columns and the pyarrow type of each column as read from
+    the database, None where it can only be inferred from the data
+    """
+    import pyarrow as pa
+
+    fieldnames, fields, column_names = frame_spec(
+        qs, fieldnames, index_col, column_names)
+    query_names = fieldnames
+    query_fields = fields
+    if verbose and not is_values_queryset(qs):
+        qs, query_names, query_fields = select_labels(qs, fieldnames, fields)
+    if not is_values_queryset(qs):
+        qs = qs.values_list(*query_names)
+
+    types = []
+    for query_name, fieldname, field in zip(query_names, fieldnames,
+                                            query_fields):
+        if is_label_alias(query_name, fieldname):
+            # Labels selected by the query are strings
+            types.append(pa.string())
+            continue
+        if not isinstance(field, Field):
+            field = get_expression_field(qs, query_name)
+        types.append(get_arrow_type(field))
+    return (qs, list(fieldnames), list(fields), list(query_names),
+            list(column_names or fieldnames), types)
+
+
+def arrow_column_type(raw_type, field, query_name, fieldname, verbose):
+    """
+    Returns the type of a column of the batches: the labels of verbose
+    fields are dictionary encoded strings
+    """
+    import pyarrow as pa
+
+    if verbose and is_verbose_field(field) or \
+            is_label_alias(query_name, fieldname):
+        return pa.dictionary(pa.int32(), pa.string())
+    return raw_type
+
+
+def arrow_schema(qs, fieldnames=(), index_col=None, verbose=True,
+                 column_names=None):
+    """
+    Returns the ``pyarrow.Schema`` of the batches ``arrow_batches`` yields,
+    derived from the model fields and the output fields of expressions
+    without reading any row, or None if the type of some column can only
+    be inferred from the data
+    """
+    import pyarrow as pa
+
+    qs, fieldnames, fields, query_names, names, types = arrow_spec(
+        qs, fieldnames, index_col, verbose, column_names)
+    if any(raw_type is None for raw_type in types):
+        return None
+    return pa.schema([
+        (name, arrow_column_type(raw_type, field, query_name, fieldname,
+                                 verbose))
+        for name, raw_type, field, query_name, fieldname in zip(
+            names, types, fields, query_names, fieldnames)])
+
+
+def arrow_batches(qs, fieldnames=(), index_col=None, verbose=True,
+                  column_names=None, chunk_size=CURSOR_CHUNK_SIZE):
+    """
+    Yields a ``pyarrow.RecordBatch`` for every ``fetchmany`` batch of at
+    most ``chunk_size`` rows of a QuerySet, so that only one batch is held
+    in memory at a time. All the batches have the same schema, see
+    ``arrow_schema``; an empty QuerySet yields a single empty batch.
+
+    Column types are derived from the model fields (see
+    ``utils.get_arrow_type``), including the output fields of annotations
+    and the fields spanned ``values()`` names end at. The few types left
+    (e.g. of ``extra()`` selects) are inferred from the first non null
+    values: batches are held back until then, and later batches are cast
+    to that type. Missing values are nulls in the validity bitmap. With
+    ``verbose`` the labels of foreign key and choices fields are dictionary
+    encoded strings, each batch having its own dictionary.
+    """
+    import pyarrow as pa
+
+    qs, fieldnames, fields, query_names, names, types = arrow_spec(
+        qs, fieldnames, index_col, verbose, column_names)
+    positions = [values_names(qs).index(name) for name in query_names]
+
+    def to_batch(columns):
+        arrays = []
+        for i, (pos, field) in enumerate(zip(positions, fields)):
+            array = pa.array(columns[pos], type=types[i] or pa.null())
+            if verbose and is_verbose_field(field):
+                if is_label_alias(query_names[i], fieldnames[i]):
+                    array = array.dictionary_encode()
+                else:
+                    array = arrow_labels(array, field)
+            arrays.append(array)
+        return pa.RecordBatch.from_arrays(arrays, names=names)
+
+    empty = True
+    pending = []
+    for columns in cursor_batches(qs, chunk_size):
+        empty = False
+        for i, pos in enumerate(positions):
+            if types[i] is None:
+                inferred = pa.array(columns[pos]).type
+                if not pa.types.is_null(inferred):
+                    types[i] = inferred
+        pending.append(columns)
+        if all(raw_type is not None for raw_type in types):
+            for held in pending:
+                yield to_batch(held)
+            pending = []
+    # Columns which are null throughout keep the null type
+    for held in pending:
+        yield to_batch(held)
+    if empty:
+        yield to_batch([[] for _ in values_names(qs)])
+
+
+def read_arrow(qs, fieldnames=(), index_col=None, verbose=True,
+               column_names=None, chunk_size=CURSOR_CHUNK_SIZE):
+    """
+    Returns a ``pyarrow.Table`` from a QuerySet.
+
+    Each column is built directly from the ``fetchmany`` batches of the
+    raw DB cursor as a chunked Arrow array of a type derived from its model
+    field (see ``utils.get_arrow_type``): timestamps (UTC when ``USE_TZ``
+    is set), ``decimal128`` for decimals, and so on. Missing values are
+    nulls in the validity bitmap. With ``verbose`` the labels of foreign
+    key and choices fields are dictionary encoded strings.
+
+    The ``index_col`` field is included as a column. See ``read_frame``
+    for the remaining parameters.
+    """
+    import pyarrow as pa
+
+    return pa.Table.from_batches(list(arrow_batches(
+        qs, fieldnames, index_col=index_col, verbose=verbose,
+        column_names=column_names, chunk_size=chunk_size)))
+
+
+def write_parquet(qs, path, fieldnames=(), index_col=None, verbose=True,
+                  column_names=None, row_group_size=CURSOR_CHUNK_SIZE,
+                  compression='snappy'):
+    """
+    Streams a QuerySet to a Parquet file, writing one row group of at most
+    ``row_group_size`` rows per ``fetchmany`` batch so that memory use does
+    not grow with the size of the QuerySet. Returns the number of rows
+    written.
+
+    The schema is derived up front from the model fields (see
+    ``arrow_schema``) and verbose columns are rendered as in
+    ``read_frame``, see ``arrow_batches``. Only if the type of some column
+    can only be inferred from the data is the schema taken from the first
+    batch. ``path`` can be a file path or a writable file object.
+    """
+    import pyarrow.parquet as pq
+
+    rows = 0
+    writer = None
+    schema = arrow_schema(qs, fieldnames, index_col=index_col,
+                          verbose=verbose, column_names=column_names)
+    try:
+        if schema is not None:
+            writer = pq.ParquetWriter(path, schema, compression=compression)
+        for batch in arrow_batches(qs, fieldnames, index_col=index_col,
+                                   verbose=verbose, column_names=column_names,
+                                   chunk_size=row_group_size):
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema,
+                                          compression=compression)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def write_feather(qs, path, fieldnames=(), index_col=None, verbose=True,
+                  column_names=None, chunk_size=CURSOR_CHUNK_SIZE,
+                  compression='lz4'):
+    """
+    Streams a QuerySet to a Feather (Arrow IPC) file one record batch of
+    at most ``chunk_size`` rows at a time and returns the number of rows
+    written.
+
+    The IPC file format does not allow dictionaries to change between
+    batches so verbose labels are written as plain strings. As for
+    ``write_parquet`` the schema is derived up front from the model
+    fields.
+    """
+    import pyarrow as pa
+
+    def decode(batch):
+        return pa.RecordBatch.from_arrays(
+            [column.cast(column.type.value_type)
+             if pa.types.is_dictionary(column.type) else column
+             for column in batch.columns], names=batch.schema.names)
+
+    rows = 0
+    writer = None
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    schema = arrow_schema(qs, fieldnames, index_col=index_col,
+                          verbose=verbose, column_names=column_names)
+    try:
+        if schema is not None:
+            writer = pa.ipc.new_file(path, pa.schema([
+                (field.name, field.type.value_type
+                 if pa.types.is_dictionary(field.type) else field.type)
+                for field in schema]), options=options)
+        for batch in arrow_batches(qs, fieldnames, index_col=index_col,
+                                   verbose=verbose, column_names=column_names,
+                                   chunk_size=chunk_size):
+            batch = decode(batch)
+            if writer is None:
+                writer = pa.ipc.new_file(path, batch.schema, options=options)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def finish_frame(df, fieldnames, fields, verbose=True, index_col=None,
+                 datetime_index=False, schema=None, timer=NULL_TIMER):
+    """
+    Applies the verbose rendering, dtype schema and index handling shared
+    by all the ``read_frame`` code paths to a freshly built frame
+    """
+    if verbose:
+        with timer.phase('verbose'):
+            update_with_verbose(df, fieldnames, fields)
+
+    if schema:
+        with timer.phase('dtypes'):
+            for name, dtype in schema.items():
+                df[name] = cast_series(df[name], dtype)
+
+    if index_col is not None or datetime_index:
+        with timer.phase('index'):
+            if index_col is not None:
+                df.set_index(index_col, inplace=True)
+
+            if datetime_index:
+                df.index = pd.to_datetime(df.index)
+    return df
+
+
+def read_frame_iter(qs, fieldnames=(), index_col=None, coerce_float=False,
+                    verbose=True, datetime_index=False, column_names=None,
+                    chunk_size=CURSOR_CHUNK_SIZE, dtypes=None,
+                    downcast=False):
+    """
+    Returns a generator of DataFrames built from consecutive chunks of at
+    most ``chunk_size`` rows of a QuerySet.
+
+    Rows are streamed with ``QuerySet.iterator`` so server-side cursors are
+    used where the backend supports them and memory stays bounded by the
+    chunk size. Every chunk has the same columns, verbose rendering and
+    index as ``read_frame`` would produce for those rows.
+
+    Parameters
+    ----------
+
+    chunk_size: The maximum number of rows in each DataFrame.
+
+    See ``read_frame`` for the remaining parameters. Passing ``dtypes`` is
+    recommended as it guarantees that every chunk gets the same dtypes,
+    e.g. even when a nullable integer column has no nulls in some chunks.
+    """
+    fieldnames, fields, column_names = frame_spec(
+        qs, fieldnames, index_col, column_names)
+    schema = frame_schema(fieldnames, fields, column_names=column_names,
+                          verbose=verbose, dtypes=dtypes, downcast=downcast,
+                          using=getattr(qs, 'db', None))
+    if not is_values_queryset(qs):
+        query_names = fieldnames
+        if verbose:
+            qs, query_names, fields = select_labels(qs, fieldnames, fields)
+        qs = qs.values_list(*query_names)
+
+    rows = qs.iterator(chunk_size=chunk_size)
+    while True:
+        recs = list(islice(rows, chunk_size))
+        if not recs:
+            return
+        df = pd.DataFrame.from_records(
+            recs,
+            columns=column_names if column_names else fieldnames,
+            coerce_float=coerce_float
+        )
+        yield finish_frame(df, fieldnames, fields, verbose=verbose,
+                           index_col=index_col,
+                           datetime_index=datetime_index, schema=schema)
 
-    df = pd.DataFrame.from_records(
-        recs,
-        columns=column_names if column_names else fieldnames,
-        coerce_float=coerce_float
-    )
 
+def extend_columns(columns, rows, names, flat=False):
+    """
+    Appends the values of ``rows``, tuples or dictionaries keyed by
+    ``names`` (or single values if ``flat``), to the lists or builders in
+    ``columns``
+    """
+    if flat:
+        batch = [rows]
+    elif rows and isinstance(rows[0], dict):
+        batch = [[row.get(name) for row in rows] for name in names]
+    else:
+        batch = [list(values) for values in zip(*rows)]
+    for column, values in zip(columns, batch):
+        column.extend(values)
+
+
+async def aread_frame(qs, fieldnames=(), index_col=None, coerce_float=False,
+                      verbose=True, datetime_index=False, column_names=None,
+                      dtypes=None, chunk_size=CURSOR_CHUNK_SIZE,
+                      downcast=False):
+    """
+    Asynchronous version of ``read_frame`` for use under ASGI.
+
+    Rows are fetched in chunks of ``chunk_size`` rows, each in a worker
+    thread, so the event loop is not blocked while waiting on the
+    database. Each chunk is transposed into columns as it arrives, as the
+    ``cursor`` engine does, so no tuple is kept per row. The verbose
+    rendering, which may look labels up in the database, runs through
+    ``sync_to_async``; building the frame, casting its dtypes and setting
+    its index run in a thread of their own. Objects that are not QuerySets
+    are read with ``read_frame`` in a worker thread.
+
+    See ``read_frame`` for the parameters.
+    """
+    if not hasattr(qs, 'query'):
+        return await sync_to_async(read_frame)(
+            qs, fieldnames=fieldnames, index_col=index_col,
+            coerce_float=coerce_float, verbose=verbose,
+            datetime_index=datetime_index, column_names=column_names,
+            dtypes=dtypes, downcast=downcast)
+
+    fieldnames, fields, column_names = frame_spec(
+        qs, fieldnames, index_col, column_names)
+    schema = frame_schema(fieldnames, fields, column_names=column_names,
+                          verbose=verbose, dtypes=dtypes, downcast=downcast,
+                          using=getattr(qs, 'db', None))
+    query_names = fieldnames
+    if not is_values_queryset(qs):
+        if verbose:
+            qs, query_names, fields = select_labels(qs, fieldnames, fields)
+        qs = qs.values_list(*query_names)
+    flat = qs._iterable_class is FlatValuesListIterable
+
+    columns = dict(
+        (query_name, [] if is_label_alias(query_name, fieldname)
+         else get_array_builder(field) or [])
+        for query_name, fieldname, field in zip(query_names, fieldnames,
+                                                fields))
+    rows = qs.iterator(chunk_size=chunk_size)
+
+    def fetch_chunk():
+        chunk = list(islice(rows, chunk_size))
+        extend_columns([columns[name] for name in query_names], chunk,
+                       query_names, flat=flat)
+        return len(chunk)
+
+    while await sync_to_async(fetch_chunk)():
+        pass
+
+    columns = dict((name, column if isinstance(column, list)
+                    else column.result())
+                   for name, column in columns.items())
+    df = await sync_to_async(frame_from_columns, thread_sensitive=False)(
+        columns, query_names, column_names=column_names or fieldnames,
+        coerce_float=coerce_float)
     if verbose:
-        update_with_verbose(df, fieldnames, fields)
+        df = await sync_to_async(finish_frame)(df, fieldnames, fields)
+    return await sync_to_async(finish_frame, thread_sensitive=False)(
+        df, fieldnames, fields, verbose=False, index_col=index_col,
+        datetime_index=datetime_index, schema=schema)
+
+
+def refresh_frame(qs, previous, updated_field='modified', key='pk',
+                  deleted_field=None, since=None, fieldnames=(),
+                  verbose=True, coerce_float=False, dtypes=None):
+    """
+    Returns ``previous``, a frame read from ``qs``, brought up to date by
+    fetching only the rows whose ``updated_field`` is at or after the
+    previous high-water mark and upserting them by ``key``.
+
+    The high-water mark is ``since`` if given, else the one recorded by
+    the previous refresh in ``previous.attrs['high_water_mark']``, else the
+    latest value of the ``updated_field`` column of ``previous``.
+
+    Rows changed since the high-water mark that no longer match ``qs``
+    (e.g. soft deleted rows excluded by a filter) and, if given, rows whose
+    ``deleted_field`` is set are removed. Rows deleted from the table
+    cannot be detected. Updated rows keep their position, new rows are
+    appended in the order of ``qs``.
+
+    Parameters
+    ----------
+
+    qs: The QuerySet ``previous`` was read from.
+
+    previous: The frame to refresh, with ``key`` as its index or as a
+              column.
+
+    updated_field: A date or datetime field set when a row is saved, e.g.
+                   with ``auto_now=True``.
+
+    key: The field identifying rows.
+
+    deleted_field: An optional boolean field flagging soft deleted rows.
+
+    since: Overrides the high-water mark.
+
+    See ``read_frame`` for the remaining parameters, which should be the
+    ones ``previous`` was read with.
+    """
+    opts = qs.model._meta
+    key_field = opts.pk if key == 'pk' else opts.get_field(key)
+    if previous.index.name in (key, key_field.name, key_field.attname):
+        key_name, as_column = previous.index.name, False
+    elif key in previous.columns or key_field.attname in previous.columns:
+        key_name = key if key in previous.columns else key_field.attname
+        as_column = True
+        previous = previous.set_index(key_name, drop=False)
+    else:
+        raise ValueError('previous has no %s index or column' % key)
+
+    if since is None:
+        since = previous.attrs.get('high_water_mark')
+    if since is None:
+        if updated_field not in previous.columns:
+            raise ValueError('Pass since or include %s in previous'
+                             % updated_field)
+        since = previous[updated_field].max()
+        if pd.isnull(since):
+            since = None
+        elif isinstance(since, pd.Timestamp):
+            since = since.to_pydatetime()
+
+    changed = qs.model._base_manager.using(qs.db)
+    if since is not None:
+        changed = changed.filter(**{'%s__gte' % updated_field: since})
+    state = [key_field.attname, updated_field]
+    if deleted_field is not None:
+        state.append(deleted_field)
+    changed = list(changed.values_list(*state))
+    high_water_mark = max([row[1] for row in changed if row[1] is not None],
+                          default=since)
+
+    updated_qs = qs
+    if since is not None:
+        updated_qs = qs.filter(**{'%s__gte' % updated_field: since})
+    if deleted_field is not None:
+        updated_qs = updated_qs.exclude(**{deleted_field: True})
+    rows = read_frame(updated_qs, fieldnames,
+                      index_col=None if as_column else key_name,
+                      verbose=verbose, coerce_float=coerce_float,
+                      dtypes=dtypes)
+    if as_column:
+        rows = rows.set_index(key_name, drop=False)
+
+    keep = previous[~(previous.index.isin([row[0] for row in changed]) |
+                      previous.index.isin(rows.index))]
+    if len(rows):
+        order = previous.index[previous.index.isin(keep.index) |
+                               previous.index.isin(rows.index)]
+        order = order.append(rows.index[~rows.index.isin(previous.index)])
+        df = pd.concat([keep, rows]).reindex(order)
+    else:
+        df = keep.copy()
+    if as_column:
+        df = df.reset_index(drop=True)
+    df.attrs['high_water_mark'] = high_water_mark
+    return df
+
+
+SNAPSHOT_METADATA = 'snapshot.json'
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_DATA_PREFIX = 'data-'
 
-    if index_col is not None:
-        df.set_index(index_col, inplace=True)
 
-    if datetime_index:
-        df.index = pd.to_datetime(df.index)
+def snapshot_fingerprint(qs):
+    """
+    Returns a fingerprint of the current contents of a QuerySet: a digest
+    of its compiled SQL, row count, largest primary key and the latest
+    value of every ``auto_now`` date field of the model. It changes when
+    rows are added or removed and, for models with an ``auto_now`` field,
+    when rows are saved.
+    """
+    opts = qs.model._meta
+    aggregates = {'rows': Count('pk'), 'max_pk': Max('pk')}
+    for field in opts.concrete_fields:
+        if getattr(field, 'auto_now', False):
+            aggregates['max_%s' % field.attname] = Max(field.attname)
+    try:
+        sql = str(qs.query)
+    except EmptyResultSet:
+        return None
+    state = qs.order_by().aggregate(**aggregates)
+    key = json.dumps([sql, sorted(state.items())], default=str)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def write_snapshot(qs, path, fieldnames=(), index_col=None, verbose=True,
+                   coerce_float=False, dtypes=None):
+    """
+    Materializes a QuerySet to the directory ``path`` as one ``.npy`` file
+    per column plus a ``snapshot.json`` metadata file, and returns the
+    metadata.
+
+    The columns are written to a new ``data-*`` subdirectory and the
+    metadata pointing to it then atomically replaces the previous one, so
+    processes which loaded the previous snapshot keep reading its files
+    unchanged. The subdirectories of snapshots older than the previous one
+    are removed.
+
+    Numeric, boolean and datetime columns are stored as plain arrays (with
+    a separate mask array for nullable dtypes) so that ``load_snapshot``
+    can memory map them. Other columns are stored as integer codes plus a
+    pickled array of their unique values. The metadata records the source
+    SQL, the creation time and the ``snapshot_fingerprint`` of the
+    QuerySet.
+
+    See ``read_frame`` for the remaining parameters.
+    """
+    fingerprint = snapshot_fingerprint(qs)
+    df = read_frame(qs, fieldnames, index_col=index_col, verbose=verbose,
+                    coerce_float=coerce_float, dtypes=dtypes)
+    os.makedirs(path, exist_ok=True)
+    try:
+        previous = read_snapshot_metadata(path).get('data')
+    except (OSError, ValueError):
+        previous = None
+    data_dir = tempfile.mkdtemp(prefix=SNAPSHOT_DATA_PREFIX, dir=path)
+
+    index_names = [name for name in df.index.names if name is not None]
+    if index_names:
+        df = df.reset_index()
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        dtype = series.dtype
+        column = {'name': name, 'dtype': str(dtype)}
+        if isinstance(dtype, pd.StringDtype):
+            column['dtype'] = 'string[%s]' % dtype.storage
+        stem = os.path.join(data_dir, str(i))
+        if isinstance(dtype, pd.CategoricalDtype):
+            column['kind'] = 'categorical'
+            np.save(stem + '.npy', series.cat.codes.to_numpy())
+            np.save(stem + '.values.npy',
+                    np.asarray(series.cat.categories, dtype=object),
+                    allow_pickle=True)
+        elif isinstance(dtype, pd.DatetimeTZDtype):
+            column.update(kind='datetimetz', tz=str(dtype.tz))
+            np.save(stem + '.npy', series.dt.tz_convert('UTC')
+                    .dt.tz_localize(None).to_numpy())
+        elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and \
+                hasattr(series.array, '_mask'):
+            column['kind'] = 'masked'
+            np.save(stem + '.npy', series.array._data)
+            np.save(stem + '.mask.npy', series.array._mask)
+        elif isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM':
+            column['kind'] = 'array'
+            np.save(stem + '.npy', series.to_numpy())
+        else:
+            column['kind'] = 'codes'
+            codes, uniques = pd.factorize(series)
+            np.save(stem + '.npy', codes)
+            np.save(stem + '.values.npy', np.asarray(uniques, dtype=object),
+                    allow_pickle=True)
+        columns.append(column)
+
+    metadata = {
+        'format': SNAPSHOT_FORMAT,
+        'data': os.path.basename(data_dir),
+        'model': qs.model._meta.label,
+        'database': qs.db,
+        'sql': str(qs.query) if fingerprint is not None else None,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'fingerprint': fingerprint,
+        'rows': len(df),
+        'index': index_names,
+        'columns': columns,
+    }
+    with tempfile.NamedTemporaryFile('w', dir=path, suffix='.tmp',
+                                     delete=False) as f:
+        json.dump(metadata, f, indent=2, default=str)
+    os.replace(f.name, os.path.join(path, SNAPSHOT_METADATA))
+
+    # Readers may still be opening the previous snapshot, keep it
+    for name in os.listdir(path):
+        if name.startswith(SNAPSHOT_DATA_PREFIX) and \
+                name not in (metadata['data'], previous):
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    return metadata
+
+
+def read_snapshot_metadata(path):
+    with open(os.path.join(path, SNAPSHOT_METADATA)) as f:
+        return json.load(f)
+
+
+def load_snapshot(path, mmap_mode='r'):
+    """
+    Returns the DataFrame stored by ``write_snapshot`` in the directory
+    ``path``. The snapshot metadata is available as
+    ``df.attrs['snapshot']``.
+
+    Numeric, boolean and naive datetime columns, and the values and masks
+    of nullable columns, are zero-copy memory maps opened with
+    ``mmap_mode`` (read only by default, see ``numpy.load``) so several
+    processes loading the same snapshot share the pages. Categorical and
+    object columns are rebuilt from their codes.
+
+    The unique values of non numeric columns are pickled: only load
+    snapshots from trusted locations.
+    """
+    metadata = read_snapshot_metadata(path)
+    # Snapshots of the first format keep their columns next to the metadata
+    data_dir = os.path.join(path, metadata.get('data', ''))
+    data = {}
+    for i, column in enumerate(metadata['columns']):
+        stem = os.path.join(data_dir, str(i))
+        values = np.load(stem + '.npy', mmap_mode=mmap_mode)
+        kind = column['kind']
+        if kind == 'array':
+            series = values
+        elif kind == 'masked':
+            mask = np.load(stem + '.mask.npy', mmap_mode=mmap_mode)
+            array_type = pd.api.types.pandas_dtype(
+                column['dtype']).construct_array_type()
+            series = array_type(values, mask)
+        elif kind == 'datetimetz':
+            series = pd.Series(values).dt.tz_localize('UTC').dt.tz_convert(
+                column['tz'])
+        else:
+            uniques = np.load(stem + '.values.npy', allow_pickle=True)
+            if kind == 'categorical':
+                series = pd.Categorical.from_codes(values, categories=uniques)
+            else:
+                series = pd.Series(np.append(uniques, None).take(values))
+                if column['dtype'] != 'object':
+                    series = series.astype(column['dtype'])
+        data[column['name']] = series
+
+    names = [column['name'] for column in metadata['columns']]
+    df = pd.DataFrame(data, columns=names, copy=False)
+    if metadata['index']:
+        df.set_index(metadata['index'], inplace=True)
+    df.attrs['snapshot'] = metadata
     return df
 
 
+def is_snapshot_stale(path, qs):
+    """
+    Returns True if the fingerprint of ``qs`` differs from the one
+    recorded when the snapshot in ``path`` was written
+    """
+    return read_snapshot_metadata(path)['fingerprint'] != \
+        snapshot_fingerprint(qs)
+
+
+#: Number of rows written per INSERT/UPDATE by ``write_frame`` and
+#: ``update_frame``. It is lowered further with ``bulk_batch_size`` where the
+#: backend limits the number of parameters of a query.
+WRITE_BATCH_SIZE = 1000
+
+
+def query_batch_size(qs, fields, objs, batch_size=WRITE_BATCH_SIZE):
+    """
+    Returns ``batch_size`` capped to the number of ``objs`` the database of
+    ``qs`` takes in a query with a parameter per ``fields`` for each
+    """
+    ops = connections[qs.db].ops
+    return max(1, min(batch_size, ops.bulk_batch_size(fields, objs)))
+
+
+def is_label_series(series, field):
+    """
+    Returns True if ``series`` holds labels rendered for the foreign key
+    ``field`` rather than the primary keys of the related model
+    """
+    if get_field_dtype(field.target_field) == string_dtype():
+        return False
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Categoricals hold either, look at their categories
+        series = series.cat.categories
+    return pd.api.types.infer_dtype(series, skipna=True) in (
+        'string', 'mixed')
+
+
+def to_field_values(series, field):
+    """
+    Converts a column to a list of values for a model field: missing
+    values (NaN, NaT, NA) become None, choice labels are mapped back to
+    their keys and foreign key labels to primary keys
+    """
+    values = series.astype(object)
+    notnull = series.notna().to_numpy()
+
+    if field.choices or field.get_internal_type() in ('ForeignKey',
+                                                      'OneToOneField'):
+        codes, uniques = pd.factorize(values[notnull])
+        if field.choices:
+            keys = dict((force_text(v), k) for k, v in field.flatchoices)
+            mapped = [keys.get(u, u) for u in uniques]
+        elif is_label_series(series, field):
+            pks = get_pks_from_labels(get_related_model(field), uniques)
+            unknown = [u for u in uniques if u not in pks]
+            if unknown:
+                raise ValueError('Unknown %s labels for %s: %r' % (
+                    get_related_model(field)._meta.label, field.name,
+                    unknown[:10]))
+            mapped = [pks[u] for u in uniques]
+        else:
+            mapped = list(uniques)
+        values = np.empty(len(series), dtype=object)
+        values[notnull] = np.array(mapped, dtype=object)[codes]
+        return values.tolist()
+
+    return values.where(notnull, None).tolist()
+
+
+def frame_to_field_values(df, model, columns=None):
+    """
+    Returns a dictionary mapping the attribute names of the fields of
+    ``model`` to the values of the matching columns of ``df``.
+
+    ``columns`` maps column names to field names and defaults to every
+    column (including a named index) named after a field of the model.
+    """
+    if df.index.name is not None and df.index.name not in df.columns:
+        df = df.reset_index()
+    if columns is None:
+        names = set()
+        for field in model._meta.concrete_fields:
+            names.update((field.name, field.attname))
+        columns = dict((c, c) for c in df.columns if c in names)
+
+    values = {}
+    for column, fieldname in columns.items():
+        field = model._meta.get_field(fieldname)
+        values[field.attname] = to_field_values(df[column], field)
+    return values
+
+
+def write_frame(qs, df, columns=None, unique_fields=None, update_fields=None,
+                batch_size=WRITE_BATCH_SIZE):
+    """
+    Writes the rows of a DataFrame to the model of a QuerySet with
+    ``bulk_create`` and returns a dictionary with the number of
+    ``rows``, ``inserted`` and ``updated`` rows, the elapsed ``seconds``
+    and the ``rows_per_second``.
+
+    Columns are converted to field values a column at a time, see
+    ``to_field_values``.
+
+    Parameters
+    ----------
+
+    qs: A QuerySet of the model to write to. Its database is used.
+
+    df: The DataFrame to write.
+
+    columns: A dictionary of column names to field names. Defaults to the
+             columns (and named index) named after a field of the model.
+
+    unique_fields: If given, rows whose ``unique_fields`` match an existing
+                   row update it instead of being inserted. This uses
+                   ``bulk_create(update_conflicts=True)`` where the backend
+                   supports it and ``bulk_update`` otherwise.
+
+    update_fields: The fields updated on existing rows. Defaults to every
+                   written field except the ``unique_fields``.
+
+    batch_size: The number of rows written per query.
+    """
+    start = time.perf_counter()
+    model = qs.model
+    values = frame_to_field_values(df, model, columns)
+    attnames = list(values)
+    objs = [model(**dict(zip(attnames, row))) for row in zip(*values.values())]
+
+    inserted, updated = len(objs), 0
+    with transaction.atomic(using=qs.db):
+        if unique_fields:
+            unique_fields = [model._meta.pk if f == 'pk' else
+                             model._meta.get_field(f) for f in unique_fields]
+            if update_fields is None:
+                update_fields = [model._meta.get_field(a).name
+                                 for a in attnames
+                                 if model._meta.get_field(a) not in
+                                 unique_fields and
+                                 not model._meta.get_field(a).primary_key]
+            existing = existing_keys(qs, unique_fields, objs)
+            updated = sum(unique_key(obj, unique_fields) in existing
+                          for obj in objs)
+            inserted -= updated
+            features = connections[qs.db].features
+            if getattr(features, 'supports_update_conflicts_with_target',
+                       False):
+                qs.bulk_create(objs, batch_size=batch_size,
+                               update_conflicts=True,
+                               unique_fields=[f.name for f in unique_fields],
+                               update_fields=update_fields)
+            else:
+                new, changed = [], []
+                for obj in objs:
+                    pk = existing.get(unique_key(obj, unique_fields))
+                    if pk is None:
+                        new.append(obj)
+                    else:
+                        obj.pk = pk
+                        changed.append(obj)
+                qs.bulk_update(changed, update_fields, batch_size=batch_size)
+                qs.bulk_create(new, batch_size=batch_size)
+        else:
+            qs.bulk_create(objs, batch_size=batch_size)
+
+    seconds = time.perf_counter() - start
+    return {
+        'rows': len(objs),
+        'inserted': inserted,
+        'updated': updated,
+        'seconds': seconds,
+        'rows_per_second': len(objs) / seconds if seconds else None,
+    }
+
+
+def unique_key(obj, fields):
+    return tuple(getattr(obj, f.attname) for f in fields)
+
+
+def existing_keys(qs, fields, objs):
+    """
+    Returns a dictionary mapping the values of ``fields`` of the rows of
+    ``qs`` matching ``objs`` to their primary keys
+    """
+    first = fields[0]
+    candidates = list(set(getattr(obj, first.attname) for obj in objs))
+    existing = {}
+    attnames = [f.attname for f in fields]
+    batch_size = query_batch_size(qs, [first], candidates)
+    for start in range(0, len(candidates), batch_size):
+        rows = qs.model._default_manager.using(qs.db).filter(**{
+            '%s__in' % first.attname: candidates[start:start + batch_size]
+        }).values_list('pk', *attnames)
+        for row in rows:
+            existing[tuple(row[1:])] = row[0]
+    return existing
+
+
+def update_frame(qs, df, key='pk', columns=None,
+                 batch_size=WRITE_BATCH_SIZE):
+    """
+    Updates the rows of a QuerySet from a DataFrame, sending UPDATEs only
+    for the rows and columns whose values differ from the database, and
+    returns a dictionary with the number of ``rows`` in the frame, the
+    ``updated``, ``unchanged`` and ``missing`` rows, the number of
+    ``cells`` changed and the elapsed ``seconds``.
+
+    Only the current values of the updated columns are fetched. Each
+    batch of changed rows is written with a single UPDATE setting every
+    changed column with ``CASE key WHEN ... THEN ... ELSE column END``.
+
+    Parameters
+    ----------
+
+    qs: The QuerySet whose rows are updated.
+
+    df: The DataFrame holding the new values.
+
+    key: The field identifying rows, read from the column of that name or
+         from the index of the frame.
+
+    columns: The columns to update, named after model fields. Defaults to
+             every column of the frame named after a field except ``key``.
+
+    batch_size: The number of rows compared and updated per query, lowered
+                where the backend limits the number of parameters.
+    """
+    start = time.perf_counter()
+    model = qs.model
+    opts = model._meta
+    key_field = opts.pk if key == 'pk' else opts.get_field(key)
+    if columns is None:
+        names = set()
+        for field in opts.concrete_fields:
+            names.update((field.name, field.attname))
+        columns = [c for c in df.columns if c in names and
+                   c not in (key, key_field.name, key_field.attname)]
+    fields = [opts.get_field(c) for c in columns]
+    attnames = [f.attname for f in fields]
+
+    keys = df[key] if key in df.columns else df.index.to_series()
+    new = pd.DataFrame(
+        dict((f.attname, to_field_values(df[c], f))
+             for c, f in zip(columns, fields)),
+        index=pd.Index(to_field_values(keys, key_field)), columns=attnames,
+        dtype=object)
+
+    # The UPDATE takes the key of each row and a key and value per column
+    batch_size = query_batch_size(qs, [key_field] + fields * 2, new.index,
+                                  batch_size)
+    updated = cells = 0
+    missing = 0
+    with transaction.atomic(using=qs.db):
+        for offset in range(0, len(new), batch_size):
+            batch = new.iloc[offset:offset + batch_size]
+            current = pd.DataFrame.from_records(
+                list(qs.filter(**{'%s__in' % key_field.attname:
+                                  list(batch.index)}).values_list(
+                    key_field.attname, *attnames)),
+                columns=[key_field.attname] + attnames,
+            ).set_index(key_field.attname)
+            missing += int(len(batch) -
+                           batch.index.isin(current.index).sum())
+            batch = batch[batch.index.isin(current.index)]
+            current = current.reindex(batch.index).astype(object)
+
+            changed = ~((batch == current) |
+                        (batch.isna() & current.isna()))
+            rows = changed.any(axis=1)
+            if not rows.any():
+                continue
+            updated += int(rows.sum())
+            cells += int(changed.values.sum())
+
+            updates = {}
+            for field in fields:
+                column = changed[field.attname]
+                if not column.any():
+                    continue
+                values = batch.loc[column.to_numpy(), field.attname]
+                updates[field.attname] = Case(
+                    *[When(**{key_field.attname: k,
+                              'then': Value(v, output_field=field)})
+                      for k, v in values.items()],
+                    default=F(field.attname), output_field=field)
+            qs.filter(**{'%s__in' % key_field.attname:
+                         list(batch.index[rows.to_numpy()])}).update(**updates)
+
+    return {
+        'rows': len(new),
+        'updated': updated,
+        'unchanged': len(new) - updated - missing,
+        'missing': missing,
+        'cells': cells,
+        'seconds': time.perf_counter() - start,
+    }
+
+
 def object_to_dict(obj, fields: list = None):
     """
         Convert obj to a dictionary
@@ -163,9 +1898,11 @@ def object_to_dict(obj, fields: list = None):
         ----------
 
         obj: obj to an item of QuerySet
-        fieldnames: reserved fields, default to all fields
+        fieldnames: reserved fields, default to all fields except the
+                    private ones such as ``_state``. ``obj`` is left
+                    untouched.
     """
     if not fields:
-        obj.__dict__.pop('_state')
-        return obj.__dict__
+        return dict((name, value) for name, value in obj.__dict__.items()
+                    if not name.startswith('_'))
     return {field: obj.__dict__.get(field) for field in fields}
@@ -1,7 +1,28 @@
 from django.db.models.query import QuerySet
-from .io import read_frame
+from .io import read_frame, read_frame_iter, CURSOR_CHUNK_SIZE
+from .io import write_frame, update_frame, WRITE_BATCH_SIZE
+from .io import aread_frame, read_arrow, write_parquet, write_feather
+from .io import write_snapshot, is_snapshot_stale, refresh_frame
 import django
+import numpy as np
+import pandas as pd
+from datetime import timezone
+from functools import wraps
+
+try:
+    from asgiref.sync import sync_to_async
+except ImportError:  # pragma: no cover (Django < 3.0)
+    sync_to_async = None
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
 from django.db import models
+from django.db.models import Count, Max, Min, Sum, Field
+from django.db.models.functions import Trunc
+
+from .io import frame_spec
+from .signals import frame_timer
+from .utils import INTEGER_FIELDS, long_to_wide, get_or_build_frame
 
 
 class PassThroughManagerMixin(object):
@@ -79,12 +100,181 @@ def create_pass_through_manager_for_queryset_class(base, queryset_cls):
     return _PassThroughManager
 
 
+#: Database aggregates used to compute pandas aggregations in the database
+DB_AGGREGATES = {'sum': Sum, 'count': Count, 'min': Min, 'max': Max}
+
+#: The partial aggregates each supported pandas aggregation is computed
+#: from in the database, with the pandas aggregation combining them
+PARTIAL_AGGREGATES = {
+    'sum': (('sum', 'sum'),),
+    'count': (('count', 'sum'),),
+    'min': (('min', 'min'),),
+    'max': (('max', 'max'),),
+    'mean': (('sum', 'sum'), ('count', 'sum')),
+}
+
+AGGREGATE_NAMES = {
+    np.sum: 'sum', np.mean: 'mean', np.min: 'min', np.max: 'max',
+    sum: 'sum', min: 'min', max: 'max',
+}
+
+
+def get_aggregate_name(aggfunc):
+    """
+    Returns the name of a pandas aggregation which can be computed in the
+    database or None if ``aggfunc`` can only be run by pandas
+    """
+    try:
+        name = AGGREGATE_NAMES.get(aggfunc, aggfunc)
+    except TypeError:  # unhashable
+        return None
+    if not isinstance(name, str):
+        return None
+    name = {'avg': 'mean', 'average': 'mean'}.get(name, name)
+    return name if name in PARTIAL_AGGREGATES else None
+
+
+def get_trunc_kind(freq):
+    """
+    Returns the ``Trunc`` kind whose buckets are the same as the bins of
+    ``DataFrame.resample(freq)`` or None if there is no such kind
+    """
+    try:
+        offset = pd.tseries.frequencies.to_offset(freq)
+    except ValueError:
+        return None
+    if offset.n != 1:
+        return None
+
+    offsets = pd.tseries.offsets
+    if isinstance(offset, offsets.Minute):
+        return 'minute'
+    if isinstance(offset, offsets.Hour):
+        return 'hour'
+    if isinstance(offset, offsets.Day):
+        return 'day'
+    if isinstance(offset, offsets.Week) and offset.weekday == 6:
+        # Weeks ending on Sunday, i.e. starting on Monday like TruncWeek
+        return 'week'
+    if isinstance(offset, (offsets.MonthEnd, offsets.MonthBegin)):
+        return 'month'
+    if isinstance(offset, offsets.QuarterEnd) and \
+            offset.startingMonth % 3 == 0 or \
+            isinstance(offset, offsets.QuarterBegin) and \
+            offset.startingMonth % 3 == 1:
+        return 'quarter'
+    if isinstance(offset, offsets.YearEnd) and offset.month == 12 or \
+            isinstance(offset, offsets.YearBegin) and offset.month == 1:
+        return 'year'
+    return None
+
+
+def get_resample_aggregate(agg_args=None, agg_kwargs=None):
+    """
+    Returns the name of the aggregation passed to ``Resampler.agg`` if it
+    can be computed in the database, otherwise None
+    """
+    agg_args = list(agg_args or [])
+    agg_kwargs = dict(agg_kwargs or {})
+    if 'func' in agg_kwargs:
+        func = agg_kwargs.pop('func')
+    elif agg_args:
+        func = agg_args.pop(0)
+    else:
+        return None
+    if agg_args or agg_kwargs:
+        return None
+    return get_aggregate_name(func)
+
+
+def is_numeric_field(field):
+    return isinstance(field, Field) and not field.choices and \
+        field.get_internal_type() in INTEGER_FIELDS + (
+            'FloatField', 'DecimalField')
+
+
+def check_timeseries_args(index, storage, values, pivot_columns):
+    assert index is not None, 'You must supply an index field'
+    assert storage in ('wide', 'long'), 'storage must be wide or long'
+    if storage == 'long':
+        assert values is not None, 'You must specify a values field'
+        assert pivot_columns is not None, 'You must specify pivot_columns'
+
+
+def reshape_timeseries(df, index, storage='wide', values=None,
+                       pivot_columns=None, freq=None, rs_kwargs=None,
+                       agg_args=None, agg_kwargs=None, duplicates=None,
+                       multiindex_columns=False):
+    """
+    Reshapes a frame read by ``to_timeseries`` from long to wide storage
+    if needed and resamples it to ``freq``
+    """
+    if storage == 'long':
+        df = long_to_wide(df, index, pivot_columns, values,
+                          aggfunc=duplicates, multiindex=multiindex_columns)
+
+    if freq is not None:
+        if rs_kwargs is None:
+            rs_kwargs = dict()
+        if agg_kwargs is None:
+            agg_kwargs = dict()
+        if agg_args is None:
+            agg_args = []
+        df = df.resample(freq, **rs_kwargs).agg(*agg_args, **agg_kwargs)
+
+    return df
+
+
+def cached_frame(method):
+    """
+    Decorates a ``DataFrameQuerySet`` method returning a DataFrame so that
+    its result is read from and stored in the frame cache when the
+    queryset was marked with ``cached()``
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._frame_cache is None:
+            return method(self, *args, **kwargs)
+        timeout, alias = self._frame_cache
+        uncached = self._chain()
+        uncached._frame_cache = None
+        return get_or_build_frame(
+            self, method.__name__, args, kwargs,
+            lambda: method(uncached, *args, **kwargs), timeout, alias)
+    return wrapper
+
+
 class DataFrameQuerySet(QuerySet):
 
+    _frame_cache = None
+
+    def _clone(self):
+        clone = super(DataFrameQuerySet, self)._clone()
+        clone._frame_cache = self._frame_cache
+        return clone
+
+    def cached(self, timeout=DEFAULT_TIMEOUT, alias='default'):
+        """
+        Returns a copy of the queryset whose ``to_dataframe``,
+        ``to_pivot_table`` and ``to_timeseries`` results are cached.
+
+        Frames are stored in the Django cache ``alias`` for ``timeout``
+        seconds (the cache default if not given), keyed by the compiled SQL,
+        its parameters and the read options, and serialized with pickle
+        protocol 5 with the column buffers kept out-of-band (protocol 4 on
+        Python 3.7). Saving or
+        deleting an instance of any model the query reads from, or changing
+        its many-to-many relations, invalidates the frames.
+        """
+        clone = self._chain()
+        clone._frame_cache = (timeout, alias)
+        return clone
+
+    @cached_frame
     def to_pivot_table(self, fieldnames=(), verbose=True,
                        values=None, rows=None, cols=None,
                        aggfunc='mean', fill_value=None, margins=False,
-                       dropna=True, coerce_float=True):
+                       dropna=True, coerce_float=True, pushdown=False):
         """
         A convenience method for creating a spread sheet style pivot table
         as a DataFrame
@@ -124,19 +314,140 @@ class DataFrameQuerySet(QuerySet):
 
         coerce_float:   Attempt to convert values to non-string, non-numeric
                         objects (like decimal.Decimal) to floating point.
-        """
-        df = self.to_dataframe(fieldnames, verbose=verbose,
-                               coerce_float=coerce_float)
 
-        return df.pivot_table(values=values, fill_value=fill_value, index=rows,
-                              columns=cols, aggfunc=aggfunc, margins=margins,
-                              dropna=dropna)
+        pushdown: If ``True`` the ``sum``, ``count``, ``mean``, ``min`` and
+                  ``max`` aggregations are computed by the database, grouped
+                  on ``rows`` and ``cols``, and only the aggregated rows are
+                  fetched and reshaped by pandas. Falls back to aggregating
+                  every row in pandas for other aggregations, when
+                  ``values`` is not given or when ``margins`` is set.
+        """
+        timer = frame_timer(self, 'to_pivot_table')
+        if pushdown:
+            with timer.phase('pushdown'):
+                table = self.pushdown_pivot(
+                    values=values, rows=rows, cols=cols, aggfunc=aggfunc,
+                    fill_value=fill_value, margins=margins, dropna=dropna,
+                    verbose=verbose, coerce_float=coerce_float)
+            if table is not None:
+                return timer.finish(table)
+
+        with timer.phase('read'):
+            df = self.to_dataframe(fieldnames, verbose=verbose,
+                                   coerce_float=coerce_float)
+
+        with timer.phase('pivot'):
+            table = df.pivot_table(values=values, fill_value=fill_value,
+                                   index=rows, columns=cols, aggfunc=aggfunc,
+                                   margins=margins, dropna=dropna)
+        return timer.finish(table)
+
+    async def ato_pivot_table(self, fieldnames=(), verbose=True,
+                              values=None, rows=None, cols=None,
+                              aggfunc='mean', fill_value=None, margins=False,
+                              dropna=True, coerce_float=True, pushdown=False):
+        """
+        Asynchronous version of ``to_pivot_table``. The rows are fetched
+        with ``ato_dataframe`` and pivoted in a worker thread.
+        """
+        if pushdown:
+            table = await sync_to_async(self.pushdown_pivot)(
+                values=values, rows=rows, cols=cols, aggfunc=aggfunc,
+                fill_value=fill_value, margins=margins, dropna=dropna,
+                verbose=verbose, coerce_float=coerce_float)
+            if table is not None:
+                return table
+
+        df = await self.ato_dataframe(fieldnames, verbose=verbose,
+                                      coerce_float=coerce_float)
+
+        return await sync_to_async(df.pivot_table, thread_sensitive=False)(
+            values=values, fill_value=fill_value, index=rows, columns=cols,
+            aggfunc=aggfunc, margins=margins, dropna=dropna)
+
+    def pushdown_pivot(self, values=None, rows=None, cols=None,
+                       aggfunc='mean', fill_value=None, margins=False,
+                       dropna=True, verbose=True, coerce_float=True):
+        """
+        Computes ``to_pivot_table(..., pushdown=True)`` with the
+        aggregations done by the database. Returns None if ``aggfunc``
+        can not be computed in the database, when ``values`` is not given
+        or when ``margins`` is set.
+        """
+        if values is None or margins:
+            return None
+        aggfuncs = aggfunc if isinstance(aggfunc, list) else [aggfunc]
+        names = [get_aggregate_name(f) for f in aggfuncs]
+        if None in names:
+            return None
+        tables = [
+            self.pushdown_pivot_table(
+                name, values=values, rows=rows, cols=cols,
+                fill_value=fill_value, dropna=dropna,
+                verbose=verbose, coerce_float=coerce_float)
+            for name in names
+        ]
+        if not isinstance(aggfunc, list):
+            return tables[0]
+        return pd.concat(
+            tables, axis=1,
+            keys=[getattr(f, '__name__', f) for f in aggfuncs])
+
+    def pushdown_pivot_table(self, aggregate, values, rows=None, cols=None,
+                             fill_value=None, dropna=True, verbose=True,
+                             coerce_float=True):
+        """
+        Computes a pivot table of the ``aggregate`` (one of the keys of
+        ``PARTIAL_AGGREGATES``) of ``values`` in the database.
 
+        The queryset is grouped on ``rows`` and ``cols`` and the partial
+        aggregates are combined by ``DataFrame.pivot_table`` so that the
+        result is the same as aggregating every row in pandas, including
+        when verbose rendering maps several keys to the same label.
+        """
+        def as_list(names):
+            if names is None:
+                return []
+            return [names] if isinstance(names, str) else list(names)
+
+        value_names = as_list(values)
+        group = list(dict.fromkeys(as_list(rows) + as_list(cols)))
+        partials = PARTIAL_AGGREGATES[aggregate]
+
+        annotations = {}
+        for partial, _ in partials:
+            for i, name in enumerate(value_names):
+                annotations['pushdown_%s_%d' % (partial, i)] = \
+                    DB_AGGREGATES[partial](name)
+        qs = self.order_by().values(*group).annotate(**annotations)
+        df = read_frame(qs, verbose=verbose, coerce_float=coerce_float)
+
+        def pivot(partial, combine, fill_value=None):
+            frame = df[group].copy()
+            for i, name in enumerate(value_names):
+                frame[name] = df['pushdown_%s_%d' % (partial, i)]
+            return frame.pivot_table(values=values, index=rows, columns=cols,
+                                     aggfunc=combine, fill_value=fill_value,
+                                     dropna=dropna)
+
+        if aggregate != 'mean':
+            return pivot(*partials[0], fill_value=fill_value)
+
+        table = pivot(*partials[0]) / pivot(*partials[1])
+        if dropna:
+            table = table.dropna(how='all').dropna(how='all', axis=1)
+        if fill_value is not None:
+            table = table.fillna(fill_value)
+        return table
+
+    @cached_frame
     def to_timeseries(self, fieldnames=(), verbose=True,
                       index=None, storage='wide',
                       values=None, pivot_columns=None, freq=None,
                       coerce_float=True, rs_kwargs=None, agg_args=None,
-                      agg_kwargs=None):
+                      agg_kwargs=None, pushdown=False, duplicates=None,
+                      multiindex_columns=False, downcast=False,
+                      categorize=None):
         """
         A convenience method for creating a time series DataFrame i.e the
         DataFrame index will be an instance of  DateTime or PeriodIndex
@@ -209,47 +520,165 @@ class DataFrameQuerySet(QuerySet):
 
         coerce_float:   Attempt to convert values to non-string, non-numeric
                         objects (like decimal.Decimal) to floating point.
+
+        pushdown:  If ``True`` and ``freq`` is one of the minute, hour, day,
+                   week (ending on Sunday), month, quarter or year
+                   frequencies the rows are bucketed with the matching
+                   ``Trunc`` function and ``sum``, ``count``, ``mean``,
+                   ``min`` or ``max`` aggregations are computed by the
+                   database. pandas then only resamples the buckets. Other
+                   cases fall back to resampling every row in pandas.
+
+        duplicates:  With ``long`` storage, how to combine values sharing a
+                     timestamp and pivot key: ``'sum'``, ``'mean'``,
+                     ``'count'``, ``'min'``, ``'max'``, ``'first'`` or
+                     ``'last'``. By default duplicates raise a ValueError.
+
+        multiindex_columns:  With ``long`` storage and a list of
+                             ``pivot_columns``, label the columns with a
+                             MultiIndex of the keys instead of concatenated
+                             strings.
+
+        downcast:  Read the rows with ``to_dataframe(downcast=downcast)``,
+                   e.g. ``'float'`` for ``float32`` value columns. Does not
+                   apply to aggregates computed with ``pushdown``.
+
+        categorize:  Read the rows with ``to_dataframe(categorize=...)``,
+                     e.g. ``['series_name']`` to hold the pivot column of
+                     ``long`` storage as codes rather than strings.
         """
-        assert index is not None, 'You must supply an index field'
-        assert storage in ('wide', 'long'), 'storage must be wide or long'
-        if rs_kwargs is None:
-            rs_kwargs = {}
+        check_timeseries_args(index, storage, values, pivot_columns)
+        timer = frame_timer(self, 'to_timeseries')
+        if pushdown and freq is not None and not rs_kwargs:
+            with timer.phase('pushdown'):
+                df = self.pushdown_timeseries(
+                    fieldnames, verbose=verbose, index=index,
+                    storage=storage, values=values,
+                    pivot_columns=pivot_columns, freq=freq,
+                    coerce_float=coerce_float,
+                    aggregate=get_resample_aggregate(agg_args, agg_kwargs),
+                    multiindex_columns=multiindex_columns)
+            if df is not None:
+                return timer.finish(df)
+
+        with timer.phase('read'):
+            df = self.to_dataframe(
+                fieldnames, verbose=verbose,
+                index=index if storage == 'wide' else None,
+                coerce_float=coerce_float, datetime_index=True,
+                downcast=downcast, categorize=categorize)
+        with timer.phase('reshape'):
+            df = reshape_timeseries(
+                df, index=index, storage=storage, values=values,
+                pivot_columns=pivot_columns, freq=freq, rs_kwargs=rs_kwargs,
+                agg_args=agg_args, agg_kwargs=agg_kwargs,
+                duplicates=duplicates, multiindex_columns=multiindex_columns)
+        return timer.finish(df)
+
+    async def ato_timeseries(self, fieldnames=(), verbose=True,
+                             index=None, storage='wide',
+                             values=None, pivot_columns=None, freq=None,
+                             coerce_float=True, rs_kwargs=None, agg_args=None,
+                             agg_kwargs=None, pushdown=False, duplicates=None,
+                             multiindex_columns=False, downcast=False):
+        """
+        Asynchronous version of ``to_timeseries``. The rows are fetched
+        with ``ato_dataframe`` and reshaped and resampled in a worker
+        thread.
+        """
+        check_timeseries_args(index, storage, values, pivot_columns)
+        if pushdown and freq is not None and not rs_kwargs:
+            df = await sync_to_async(self.pushdown_timeseries)(
+                fieldnames, verbose=verbose, index=index, storage=storage,
+                values=values, pivot_columns=pivot_columns, freq=freq,
+                coerce_float=coerce_float,
+                aggregate=get_resample_aggregate(agg_args, agg_kwargs),
+                multiindex_columns=multiindex_columns)
+            if df is not None:
+                return df
+
+        df = await self.ato_dataframe(
+            fieldnames, verbose=verbose,
+            index=index if storage == 'wide' else None,
+            coerce_float=coerce_float, datetime_index=True, downcast=downcast)
+        return await sync_to_async(reshape_timeseries, thread_sensitive=False)(
+            df, index=index, storage=storage, values=values,
+            pivot_columns=pivot_columns, freq=freq, rs_kwargs=rs_kwargs,
+            agg_args=agg_args, agg_kwargs=agg_kwargs, duplicates=duplicates,
+            multiindex_columns=multiindex_columns)
+
+    def pushdown_timeseries(self, fieldnames=(), verbose=True, index=None,
+                            storage='wide', values=None, pivot_columns=None,
+                            freq=None, coerce_float=True, aggregate=None,
+                            multiindex_columns=False):
+        """
+        Computes ``to_timeseries(..., freq=freq)`` with the rows bucketed and
+        aggregated by the database. Returns None if ``freq``, ``aggregate``
+        or the value columns can not be computed in the database.
+        """
+        kind = get_trunc_kind(freq)
+        if kind is None or aggregate is None:
+            return None
+
+        fieldnames, fields, _ = frame_spec(self, fieldnames, index)
+        fields = dict(zip(fieldnames, fields))
+        index_field = fields.get(index)
+        if not isinstance(index_field, Field) or \
+                index_field.get_internal_type() not in ('DateTimeField',
+                                                        'DateField'):
+            return None
+        if index_field.get_internal_type() == 'DateField' and \
+                kind in ('minute', 'hour'):
+            return None
 
         if storage == 'wide':
-            df = self.to_dataframe(fieldnames, verbose=verbose, index=index,
-                                   coerce_float=coerce_float, datetime_index=True)
+            value_names = [name for name in fieldnames if name != index]
+            group = []
         else:
-            df = self.to_dataframe(fieldnames, verbose=verbose,
-                                   coerce_float=coerce_float, datetime_index=True)
-            assert values is not None, 'You must specify a values field'
-            assert pivot_columns is not None, 'You must specify pivot_columns'
-
-            if isinstance(pivot_columns, (tuple, list)):
-                df['combined_keys'] = ''
-                for c in pivot_columns:
-                    df['combined_keys'] += df[c].str.upper() + '.'
-
-                df['combined_keys'] += values.lower()
-
-                df = df.pivot(index=index,
-                              columns='combined_keys',
-                              values=values)
+            value_names = [values]
+            group = list(pivot_columns) if isinstance(
+                pivot_columns, (tuple, list)) else [pivot_columns]
+        if not value_names or not all(
+                is_numeric_field(fields.get(name)) for name in value_names):
+            return None
+
+        tzinfo = timezone.utc if settings.USE_TZ and \
+            index_field.get_internal_type() == 'DateTimeField' else None
+        partials = PARTIAL_AGGREGATES[aggregate]
+        annotations = {}
+        for partial, _ in partials:
+            for i, name in enumerate(value_names):
+                annotations['pushdown_%s_%d' % (partial, i)] = \
+                    DB_AGGREGATES[partial](name)
+        qs = self.order_by().annotate(
+            pushdown_bucket=Trunc(index, kind, tzinfo=tzinfo)
+        ).values('pushdown_bucket', *group).annotate(**annotations)
+        df = read_frame(qs, verbose=verbose, coerce_float=coerce_float)
+        df.rename(columns={'pushdown_bucket': index}, inplace=True)
+        df[index] = pd.to_datetime(df[index])
+
+        def resample(partial, combine):
+            if storage == 'wide':
+                frame = pd.DataFrame(
+                    {name: df['pushdown_%s_%d' % (partial, i)].values
+                     for i, name in enumerate(value_names)},
+                    index=pd.DatetimeIndex(df[index], name=index))
             else:
-                df = df.pivot(index=index,
-                              columns=pivot_columns,
-                              values=values)
+                frame = long_to_wide(
+                    df.rename(columns={'pushdown_%s_0' % partial: values}),
+                    index, pivot_columns, values, aggfunc=combine,
+                    multiindex=multiindex_columns)
+            return frame.resample(freq).agg(combine)
 
-        if freq is not None:
-            if agg_kwargs is None:
-                agg_kwargs = dict()
-            if agg_args is None:
-                agg_args = []
-            df = df.resample(freq, **rs_kwargs).agg(*agg_args, **agg_kwargs)
-
-        return df
+        if aggregate != 'mean':
+            return resample(*partials[0])
+        return resample(*partials[0]) / resample(*partials[1])
 
+    @cached_frame
     def to_dataframe(self, fieldnames=(), verbose=True, index=None,
-                     coerce_float=False, datetime_index=False):
+                     coerce_float=False, datetime_index=False,
+                     engine='default', dtypes=None, parallel=None,
+                     backend='numpy', downcast=False, categorize=None):
         """
         Returns a DataFrame from the queryset
 
@@ -276,11 +705,207 @@ class DataFrameQuerySet(QuerySet):
 
         datetime_index: specify whether index should be converted to a
                         DateTimeIndex.
+
+        engine: ``'default'`` or ``'cursor'``. See ``io.read_frame``.
+
+        dtypes: None to let pandas infer the column dtypes, ``'auto'`` to
+                derive them from the model fields or a dictionary of
+                per column overrides. See ``io.read_frame``.
+
+        parallel: The number of primary key ranges fetched concurrently on
+                  separate connections. See ``io.read_frame``.
+
+        backend: ``'numpy'`` or ``'pyarrow'`` for ``pandas.ArrowDtype``
+                 columns. See ``io.read_frame``.
+
+        downcast: If True integer and boolean columns get the narrowest
+                  dtype their model field allows, and ``FloatField``
+                  columns are also read as ``float32`` if ``'float'``.
+                  See ``io.read_frame``.
+
+        categorize: A list of column names, or a number of categories for
+                    string columns with at most that many distinct values,
+                    to build as categoricals while the rows are fetched.
+                    See ``io.read_frame``.
         """
 
         return read_frame(self, fieldnames=fieldnames, verbose=verbose,
                           index_col=index, coerce_float=coerce_float,
-                          datetime_index=datetime_index)
+                          datetime_index=datetime_index, engine=engine,
+                          dtypes=dtypes, parallel=parallel, backend=backend,
+                          downcast=downcast, categorize=categorize)
+
+    def to_arrow(self, fieldnames=(), verbose=True, index=None,
+                 chunk_size=CURSOR_CHUNK_SIZE):
+        """
+        Returns a ``pyarrow.Table`` from the queryset, with column types
+        derived from the model fields and the labels of verbose fields
+        dictionary encoded. The ``index`` field is included as a column.
+        Requires pyarrow. See ``io.read_arrow``.
+        """
+        return read_arrow(self, fieldnames=fieldnames, index_col=index,
+                          verbose=verbose, chunk_size=chunk_size)
+
+    def to_parquet(self, path, fieldnames=(), verbose=True, index=None,
+                   row_group_size=CURSOR_CHUNK_SIZE, compression='snappy'):
+        """
+        Streams the queryset to a Parquet file, one row group of at most
+        ``row_group_size`` rows at a time, and returns the number of rows
+        written. Memory use does not grow with the size of the queryset.
+        Requires pyarrow. See ``io.write_parquet``.
+        """
+        return write_parquet(self, path, fieldnames=fieldnames,
+                             index_col=index, verbose=verbose,
+                             row_group_size=row_group_size,
+                             compression=compression)
+
+    def to_feather(self, path, fieldnames=(), verbose=True, index=None,
+                   chunk_size=CURSOR_CHUNK_SIZE, compression='lz4'):
+        """
+        Streams the queryset to a Feather file, one record batch of at
+        most ``chunk_size`` rows at a time, and returns the number of rows
+        written. Requires pyarrow. See ``io.write_feather``.
+        """
+        return write_feather(self, path, fieldnames=fieldnames,
+                             index_col=index, verbose=verbose,
+                             chunk_size=chunk_size, compression=compression)
+
+    async def ato_dataframe(self, fieldnames=(), verbose=True, index=None,
+                            coerce_float=False, datetime_index=False,
+                            dtypes=None, chunk_size=CURSOR_CHUNK_SIZE,
+                            downcast=False):
+        """
+        Asynchronous version of ``to_dataframe`` for use under ASGI. Rows
+        are fetched in chunks of ``chunk_size`` rows, each in a worker
+        thread, and transposed into columns as they arrive. See
+        ``io.aread_frame``.
+        """
+        return await aread_frame(self, fieldnames=fieldnames, verbose=verbose,
+                                 index_col=index, coerce_float=coerce_float,
+                                 datetime_index=datetime_index, dtypes=dtypes,
+                                 chunk_size=chunk_size, downcast=downcast)
+
+    def iter_dataframes(self, fieldnames=(), verbose=True, index=None,
+                        coerce_float=False, datetime_index=False,
+                        chunk_size=CURSOR_CHUNK_SIZE, dtypes=None,
+                        downcast=False):
+        """
+        Returns a generator of DataFrames, each built from at most
+        ``chunk_size`` rows of the queryset, so that querysets too large
+        to hold in a single frame can be processed in constant memory.
+
+        Parameters
+        -----------
+
+        chunk_size: The maximum number of rows in each DataFrame.
+
+        See ``to_dataframe`` for the remaining parameters.
+        """
+        return read_frame_iter(self, fieldnames=fieldnames, verbose=verbose,
+                               index_col=index, coerce_float=coerce_float,
+                               datetime_index=datetime_index,
+                               chunk_size=chunk_size, dtypes=dtypes,
+                               downcast=downcast)
+
+    def from_dataframe(self, df, columns=None, batch_size=WRITE_BATCH_SIZE):
+        """
+        Inserts the rows of a DataFrame as new instances of the model in
+        batches and returns a dictionary of write statistics.
+
+        Columns are matched to model fields by name; missing values become
+        NULL, choice labels and the labels of verbose foreign key columns
+        are mapped back to their stored values.
+
+        Parameters
+        -----------
+
+        columns: A dictionary of column names to field names.
+
+        batch_size: The number of rows inserted per query.
+
+        See ``io.write_frame``.
+        """
+        return write_frame(self, df, columns=columns, batch_size=batch_size)
+
+    def bulk_upsert(self, df, unique_fields=('pk',), update_fields=None,
+                    columns=None, batch_size=WRITE_BATCH_SIZE):
+        """
+        Inserts the rows of a DataFrame and updates the existing instances
+        whose ``unique_fields`` match, returning a dictionary of write
+        statistics.
+
+        Parameters
+        -----------
+
+        unique_fields: The fields identifying existing rows.
+
+        update_fields: The fields updated on existing rows. Defaults to
+                       every written field except the ``unique_fields``.
+
+        See ``from_dataframe`` for the remaining parameters.
+        """
+        return write_frame(self, df, columns=columns,
+                           unique_fields=unique_fields,
+                           update_fields=update_fields,
+                           batch_size=batch_size)
+
+    def update_from_dataframe(self, df, key='pk', columns=None,
+                              batch_size=WRITE_BATCH_SIZE):
+        """
+        Updates the rows of the queryset matching the ``key`` of each row
+        of a DataFrame, sending UPDATEs only for values that changed, and
+        returns a dictionary of change statistics.
+
+        Parameters
+        -----------
+
+        key: The field identifying rows, read from the column of that name
+             or from the index of the frame.
+
+        columns: The columns to update. Defaults to every column named
+                 after a model field except ``key``.
+
+        batch_size: The number of rows compared and updated per query.
+
+        See ``io.update_frame``.
+        """
+        return update_frame(self, df, key=key, columns=columns,
+                            batch_size=batch_size)
+
+    def refresh_dataframe(self, previous, updated_field='modified', key='pk',
+                          deleted_field=None, since=None, fieldnames=(),
+                          verbose=True, coerce_float=False, dtypes=None):
+        """
+        Returns ``previous``, a DataFrame read from the queryset, updated
+        with the rows whose ``updated_field`` changed since the last
+        refresh, upserted by ``key``. Rows soft deleted through
+        ``deleted_field``, or changed so they no longer match the queryset,
+        are removed. See ``io.refresh_frame``.
+        """
+        return refresh_frame(self, previous, updated_field=updated_field,
+                             key=key, deleted_field=deleted_field,
+                             since=since, fieldnames=fieldnames,
+                             verbose=verbose, coerce_float=coerce_float,
+                             dtypes=dtypes)
+
+    def snapshot(self, path, fieldnames=(), verbose=True, index=None,
+                 coerce_float=False, dtypes=None):
+        """
+        Materializes the queryset to the directory ``path`` in a format
+        ``io.load_snapshot`` can memory map, recording the source SQL and a
+        fingerprint of the data. Returns the snapshot metadata.
+        See ``io.write_snapshot``.
+        """
+        return write_snapshot(self, path, fieldnames=fieldnames,
+                              index_col=index, verbose=verbose,
+                              coerce_float=coerce_float, dtypes=dtypes)
+
+    def is_snapshot_stale(self, path):
+        """
+        Returns True if the rows of the queryset changed since the snapshot
+        in ``path`` was written. See ``io.snapshot_fingerprint``.
+        """
+        return is_snapshot_stale(path, self)
 
 
 DataFrameManager = models.Manager.from_queryset(DataFrameQuerySet)
@@ -0,0 +1,120 @@
+"""
+Signals sent while frames are read, to find out where the time goes.
+
+Both signals are sent with the model of the QuerySet as ``sender`` and a
+``source`` argument naming what read the frame: ``'read_frame'``,
+``'to_pivot_table'`` or ``'to_timeseries'``. Nothing is measured unless a
+receiver is connected to one of them.
+"""
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.db import connections
+from django.dispatch import Signal
+
+#: Sent when a phase of reading a frame ends, with the arguments ``source``,
+#: ``phase``, ``seconds``, ``queries`` (the number of SQL queries run during
+#: the phase) and ``query_seconds`` (the time spent executing them).
+#:
+#: ``read_frame`` phases are ``'fetch'`` (running the query and fetching
+#: the rows), ``'build'`` (building the DataFrame), ``'verbose'`` (rendering
+#: foreign keys and choices), ``'dtypes'`` and ``'index'``. The
+#: ``DataFrameQuerySet`` helpers report ``'pushdown'``, ``'read'`` and
+#: ``'pivot'`` or ``'reshape'``.
+frame_phase = Signal()
+
+#: Sent once a frame has been read, with the arguments ``source``,
+#: ``phases`` (a dictionary of phase names to seconds), ``seconds``,
+#: ``rows``, ``columns``, ``nbytes`` (the shallow memory usage of the
+#: frame, which does not count the Python objects of object columns) and
+#: ``queries``.
+frame_read = Signal()
+
+_null = nullcontext()
+
+
+class NullTimer(object):
+    """Stands in for ``FrameTimer`` when no receiver is connected"""
+
+    def phase(self, name):
+        return _null
+
+    def count_queries(self):
+        return _null
+
+    def finish(self, df):
+        return df
+
+
+NULL_TIMER = NullTimer()
+
+
+class FrameTimer(object):
+    """
+    Times the phases of reading a frame and counts the queries they run,
+    then sends ``frame_phase`` and ``frame_read``
+    """
+
+    def __init__(self, sender, source, using=None):
+        self.sender = sender
+        self.source = source
+        self.using = using
+        self.phases = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.queries += 1
+                self.query_seconds += seconds
+
+    def count_queries(self):
+        """
+        Counts the queries run on the connection of the current thread, e.g.
+        in the worker threads of a parallel read
+        """
+        if self.using is None:
+            return _null
+        return connections[self.using].execute_wrapper(self._execute)
+
+    @contextmanager
+    def phase(self, name):
+        queries, query_seconds = self.queries, self.query_seconds
+        start = time.perf_counter()
+        with self.count_queries():
+            yield
+        seconds = time.perf_counter() - start
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        frame_phase.send(
+            self.sender, source=self.source, phase=name, seconds=seconds,
+            queries=self.queries - queries,
+            query_seconds=self.query_seconds - query_seconds)
+
+    def finish(self, df):
+        frame_read.send(
+            self.sender, source=self.source, phases=self.phases,
+            seconds=time.perf_counter() - self.started, rows=len(df),
+            columns=len(df.columns),
+            nbytes=int(df.memory_usage(index=True, deep=False).sum()),
+            queries=self.queries)
+        return df
+
+
+def frame_timer(qs, source):
+    """
+    Returns a ``FrameTimer`` for reading a frame from ``qs``, or a
+    ``NullTimer`` if no receiver would get its signals
+    """
+    sender = getattr(qs, 'model', None)
+    if not (frame_phase.has_listeners(sender) or
+            frame_read.has_listeners(sender)):
+        return NULL_TIMER
+    return FrameTimer(sender, source, getattr(qs, 'db', None))
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Concat
 from six import python_2_unicode_compatible
 from django_pandas.managers import DataFrameManager, PassThroughManager
 
@@ -137,6 +139,8 @@ class Security(models.Model):
     symbol = models.CharField(max_length=20)
     isin = models.CharField(max_length=20)
 
+    pandas_label = Concat('isin', Value('-'), 'symbol')
+
     def __str__(self):
         return "{0}-{1}".format(self.isin, self.symbol)
 
@@ -175,10 +179,22 @@ class Portfolio(models.Model):
     name = models.CharField(max_length=20)
     securities = models.ManyToManyField(Security)
 
+    objects = DataFrameManager()
+
     def __str__(self):
         return self.name
 
 
+class Holding(models.Model):
+    trader = models.ForeignKey(Trader, on_delete=models.CASCADE)
+    security = models.ForeignKey(Security, on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+    modified = models.DateTimeField(auto_now=True)
+    is_deleted = models.BooleanField(default=False)
+
+    objects = DataFrameManager()
+
+
 class DudeQuerySet(models.query.QuerySet):
     def abiding(self):
         return self.filter(abides=True)
@@ -1,12 +1,37 @@
+import os
+import tempfile
+import time
+from unittest import mock, skipIf
+
+from asgiref.sync import sync_to_async
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from django.core.cache import cache
 from django.core.paginator import Paginator
-from django.test import TestCase
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 import django
-from django.db.models import Sum
+from django.db.models import Case, F, IntegerField, Sum, When
 import pandas as pd
 import numpy as np
 from .models import (MyModel, Trader, Security, TradeLog, TradeLogNote,
-                     MyModelChoice, Portfolio)
-from django_pandas.io import read_frame
+                     MyModelChoice, Portfolio, Holding)
+from django_pandas.io import (read_frame, read_frame_iter, clear_spec_cache,
+                              to_fields, partition_ranges, aread_frame,
+                              read_arrow, load_snapshot, CategoricalBuilder,
+                              cursor_columns, arrow_schema)
+from django_pandas.utils import (string_dtype, replace_from_choices,
+                                 replace_pk, invalidate, get_label_cache,
+                                 LabelCache, get_downcast_dtype,
+                                 cast_series)
+from django_pandas.signals import frame_phase, frame_read
 
 
 class IOTest(TestCase):
@@ -101,12 +126,80 @@ class IOTest(TestCase):
         self.assertEqual(df.col1[1], u'Second \U0001f948')
         self.assertEqual(df.col1[2], u'Third \U0001f949')
         self.assertEqual(df.col1[3], u'Second \U0001f948')
+        self.assertIsInstance(df.col1.dtype, pd.CategoricalDtype)
+        self.assertEqual(len(df.col1.cat.categories), 3)
         df = read_frame(qs, verbose=False)
         self.assertEqual(df.col1[0], 1)
         self.assertEqual(df.col1[1], 2)
         self.assertEqual(df.col1[2], 3)
         self.assertEqual(df.col1[3], 2)
 
+    def test_cursor_engine(self):
+        MyModelChoice.objects.create(col1=1, col2=9999.99)
+        MyModelChoice.objects.create(col1=2, col2=None)
+        querysets = [
+            (MyModel.objects.all(), {}),
+            (MyModel.objects.all(), {'fieldnames': ['col1', 'col2'],
+                                     'index_col': 'index_col'}),
+            (MyModel.objects.values('index_col', 'col1').annotate(
+                scol1=Sum('col1')), {}),
+            (MyModel.objects.all(), {'fieldnames': ['col1', 'col2'],
+                                     'column_names': ['a', 'b']}),
+            (MyModel.objects.none(), {}),
+            (MyModelChoice.objects.all(), {'verbose': True}),
+            (MyModelChoice.objects.all(), {'verbose': False}),
+            # A column of nulls only stays object as with from_records
+            (MyModelChoice.objects.filter(col2=None), {}),
+        ]
+        for qs, kwargs in querysets:
+            pd.testing.assert_frame_equal(
+                read_frame(qs, engine='cursor', **kwargs),
+                read_frame(qs, **kwargs))
+
+    def test_bad_engine(self):
+        qs = MyModel.objects.all()
+        self.assertRaises(ValueError, read_frame, qs, engine='spam')
+
+    def test_choices_not_in_choices(self):
+        render = replace_from_choices({1: 'one', 2: 'two', 3: 'one'})
+        values = render(pd.Series([1, None, 7, 3, 2, 7]))
+        self.assertIsInstance(values, pd.Categorical)
+        self.assertEqual(list(values.categories), ['one', 'two', 7])
+        self.assertEqual(values.tolist(),
+                         ['one', np.nan, 7, 'one', 'two', 7])
+
+    def test_label_cache(self):
+        label_cache = LabelCache(maxsize=2, timeout=60)
+        label_cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(list(label_cache._local), ['b', 'c'])
+        with mock.patch.object(cache, 'get_many',
+                               wraps=cache.get_many) as get_many:
+            self.assertEqual(label_cache.get_many(['a', 'b', 'c']),
+                             {'a': 1, 'b': 2, 'c': 3})
+            get_many.assert_called_once_with(['a'])
+            get_many.reset_mock()
+            # Expired entries are read again from the shared tier
+            with mock.patch('django_pandas.utils.time.monotonic',
+                            return_value=time.monotonic() + 61):
+                self.assertEqual(label_cache.get_many(['c']), {'c': 3})
+            get_many.assert_called_once_with(['c'])
+        label_cache.delete('c')
+        self.assertEqual(label_cache.get_many(['c']), {})
+
+    def test_spec_cache(self):
+        clear_spec_cache()
+        qs = MyModel.objects.all()
+        with mock.patch('django_pandas.io.to_fields',
+                        wraps=to_fields) as resolve:
+            df = read_frame(qs, ['col1', 'col2'], index_col='index_col')
+            pd.testing.assert_frame_equal(
+                df, read_frame(qs, ['col1', 'col2'], index_col='index_col'))
+            self.assertEqual(resolve.call_count, 1)
+            setting_changed.send(sender=None, setting='INSTALLED_APPS',
+                                 value=(), enter=True)
+            read_frame(qs, ['col1', 'col2'], index_col='index_col')
+            self.assertEqual(resolve.call_count, 2)
+
     def test_index(self):
         qs = MyModel.objects.all()
         df = read_frame(qs, ['col1', 'col2', 'col3', 'col4'],
@@ -191,6 +284,64 @@ class RelatedFieldsTest(TestCase):
                 df2.trader.tolist()
             )
 
+    def test_replace_pk(self):
+        cache.clear()
+        get_label_cache().clear()
+        bob, fish = Trader.objects.order_by('pk')
+        pks = pd.Series([bob.pk, None, fish.pk, bob.pk, 999])
+        render = replace_pk(Trader)
+        with self.assertNumQueries(1):
+            labels = render(pks)
+        self.assertEqual(list(labels),
+                         ['Jim Brown', None, 'Fred Fish', 'Jim Brown', None])
+        with self.assertNumQueries(1):
+            # Only the pk missing from the cache is looked up again
+            render(pks)
+        with self.assertNumQueries(0):
+            render(pks.iloc[:4])
+
+        invalidate(bob)
+        with self.assertNumQueries(1):
+            labels = replace_pk(Trader, categorical=True)(pks)
+        self.assertIsInstance(labels, pd.Categorical)
+        self.assertEqual(list(labels.categories), ['Jim Brown', 'Fred Fish'])
+        self.assertEqual(labels.codes.tolist(), [0, -1, 1, 0, -1])
+
+    def test_replace_pk_batches(self):
+        cache.clear()
+        get_label_cache().clear()
+        pks = pd.Series(Trader.objects.values_list('pk', flat=True))
+        with mock.patch('django_pandas.utils.VERBOSE_BATCH_SIZE', 1):
+            with self.assertNumQueries(2):
+                replace_pk(Trader)(pks)
+
+    def test_label_cache_invalidation(self):
+        qs = TradeLog.objects.filter(trader__name='Jim Brown')
+        read_frame(qs, ['trader'])
+        with self.assertNumQueries(1):
+            self.assertEqual(set(read_frame(qs, ['trader']).trader),
+                             {'Jim Brown'})
+        Trader.objects.filter(name='Jim Brown').update(name='x')
+        bob = Trader.objects.get(name='x')
+        bob.name = 'James Brown'
+        bob.save()
+        df = read_frame(TradeLog.objects.filter(trader=bob), ['trader'])
+        self.assertEqual(set(df.trader), {'James Brown'})
+
+    def test_label_expression(self):
+        qs = TradeLog.objects.select_related('symbol').order_by('pk')
+        expected = [str(t.symbol) if t.symbol else None for t in qs]
+        for engine in ('default', 'cursor'):
+            with self.assertNumQueries(1):
+                df = read_frame(qs, ['symbol', 'price'], engine=engine)
+            self.assertEqual(df.symbol.tolist(), expected)
+        chunks = read_frame_iter(qs, ['symbol', 'price'], chunk_size=5)
+        self.assertEqual(pd.concat(chunks).symbol.tolist(), expected)
+        df = read_frame(qs, ['symbol'], verbose=False)
+        self.assertEqual(df.symbol.dropna().tolist(),
+                         list(qs.exclude(symbol=None).values_list(
+                             'symbol', flat=True)))
+
     def test_verbose_duplicates_fieldnames(self):
         qs = TradeLog.objects.all()
         df = read_frame(qs, fieldnames=['trader', 'trader', 'price'])
@@ -229,6 +380,413 @@ class RelatedFieldsTest(TestCase):
             df.trader__name.tolist()
         )
 
+    def test_cursor_engine(self):
+        qs = TradeLog.objects.all()
+        cols = ['log_datetime', 'symbol', 'symbol__isin', 'trader__name',
+                'price', 'volume', 'note__note']
+        for kwargs in ({}, {'verbose': False}, {'fieldnames': cols},
+                       {'fieldnames': cols, 'index_col': 'log_datetime',
+                        'datetime_index': True}):
+            pd.testing.assert_frame_equal(
+                read_frame(qs, engine='cursor', **kwargs),
+                read_frame(qs, **kwargs))
+
+        Portfolio.objects.create(name='empty')
+        qs = Portfolio.objects.filter(securities=None)
+        fieldnames = ['name', 'securities__tradelog__log_datetime']
+        df = read_frame(qs, fieldnames, engine='cursor')
+        self.assertEqual(df.securities__tradelog__log_datetime.dtype, object)
+        pd.testing.assert_frame_equal(df, read_frame(qs, fieldnames))
+
+    def test_cursor_engine_arrays(self):
+        qs = TradeLog.objects.order_by('-pk').values_list(
+            'id', 'symbol', 'price', 'log_datetime')
+        fields = dict((name, TradeLog._meta.get_field(name))
+                      for name in ('id', 'symbol', 'price', 'log_datetime'))
+        # The null symbols are in the last batches
+        columns = cursor_columns(qs, chunk_size=1, fields=fields)
+        self.assertEqual(columns['id'].dtype, np.int64)
+        self.assertEqual(columns['symbol'].dtype, np.float64)
+        self.assertTrue(np.isnan(columns['symbol'][-1]))
+        self.assertEqual(columns['price'].dtype, np.float64)
+        self.assertIsInstance(columns['log_datetime'], pd.DatetimeIndex)
+
+        for trader in Trader.objects.all():
+            Holding.objects.create(trader=trader,
+                                   security=Security.objects.first(),
+                                   quantity=1, is_deleted=trader.pk % 2)
+        holdings = Holding.objects.all()
+        with override_settings(USE_TZ=True):
+            for qs in (TradeLog.objects.all(), holdings):
+                pd.testing.assert_frame_equal(
+                    read_frame(qs, verbose=False, engine='cursor'),
+                    read_frame(qs, verbose=False))
+
+    def test_dtypes(self):
+        qs = TradeLog.objects.all()
+        string = pd.api.types.pandas_dtype(string_dtype())
+        expected = {
+            'id': 'Int64', 'trader': string, 'symbol': string,
+            'log_datetime': 'datetime64[ns]', 'price': 'float64',
+            'volume': 'Int64', 'note': 'Int64',
+        }
+        for engine in ('default', 'cursor'):
+            df = read_frame(qs, dtypes='auto', engine=engine)
+            self.assertEqual(df.dtypes.to_dict(),
+                             {k: pd.api.types.pandas_dtype(v)
+                              for k, v in expected.items()})
+            self.assertListEqual(
+                list(qs.values_list('trader__name', flat=True)),
+                df.trader.tolist())
+            self.assertTrue(df.symbol.isna().iloc[:2].all())
+
+            df = read_frame(qs, ['trader', 'symbol__isin', 'volume'],
+                            verbose=False, engine=engine,
+                            dtypes={'volume': 'float32'})
+            self.assertEqual(df.trader.dtype, 'Int64')
+            self.assertEqual(df.symbol__isin.dtype, string)
+            self.assertEqual(df.volume.dtype, 'float32')
+
+        # Columns with a dtype are built straight from the fetched values,
+        # without an intermediate frame of objects
+        with mock.patch.object(pd.DataFrame, 'from_records') as from_records:
+            read_frame(qs, dtypes='auto')
+            from_records.assert_not_called()
+        # ... unless some names cannot be selected
+        df = read_frame(qs, ['price', 'spam'], dtypes='auto')
+        self.assertEqual(df.price.dtype, 'float64')
+        self.assertTrue(df.spam.isna().all())
+
+    def test_downcast(self):
+        qs = TradeLog.objects.all()
+        for engine in ('default', 'cursor'):
+            df = read_frame(qs, ['trader', 'symbol', 'price', 'volume',
+                                 'symbol__id'],
+                            verbose=False, engine=engine, downcast=True)
+            # SQLite integer columns all hold 64-bit values
+            self.assertEqual(df.dtypes.astype(str).to_dict(), {
+                'trader': 'int64', 'symbol': 'Int64', 'price': 'float64',
+                'volume': 'int64', 'symbol__id': 'Int64'})
+            pd.testing.assert_frame_equal(
+                df, read_frame(qs, ['trader', 'symbol', 'price', 'volume',
+                                    'symbol__id'], verbose=False),
+                check_dtype=False)
+
+        df = read_frame(qs, ['price', 'trader'], downcast='float',
+                        dtypes={'trader': 'category'})
+        self.assertEqual(df.price.dtype, 'float32')
+        self.assertEqual(df.trader.dtype, 'category')
+        df = read_frame(MyModelChoice.objects.all(), verbose=False,
+                        downcast=True)
+        self.assertEqual(df.col1.dtype, 'int8')
+        self.assertRaises(ValueError, read_frame, qs, downcast='int')
+
+        Trader.objects.create(pk=3000000000, name='Big')
+        df = read_frame(Trader.objects.order_by('pk'), downcast=True)
+        self.assertEqual(df.id.iloc[-1], 3000000000)
+
+    def test_get_downcast_dtype(self):
+        from django.core.validators import MaxValueValidator
+        from django.db import models
+
+        # A backend whose integer columns have the ranges Django documents
+        bounded = mock.Mock(ops=BaseDatabaseOperations(connection))
+        cases = [
+            (models.SmallIntegerField(), 'int16', 'int64'),
+            (models.PositiveSmallIntegerField(
+                validators=[MaxValueValidator(100)]), 'int8', 'int64'),
+            (models.PositiveIntegerField(null=True), 'Int32', 'Int64'),
+            (models.BigIntegerField(), 'int64', 'int64'),
+            (models.IntegerField(choices=[(1, 'a'), (300, 'b')]), 'int16',
+             'int16'),
+            (models.BooleanField(), 'bool', 'bool'),
+            (models.BooleanField(null=True), 'boolean', 'boolean'),
+            (models.FloatField(), 'float64', 'float64'),
+            (models.CharField(), None, None),
+        ]
+        for field, dtype, sqlite_dtype in cases:
+            self.assertEqual(get_downcast_dtype(field, connection=bounded),
+                             dtype)
+            # SQLite does not bound its integer columns: only validators
+            # and choices narrow them
+            self.assertEqual(get_downcast_dtype(field), sqlite_dtype)
+        self.assertEqual(get_downcast_dtype(models.FloatField(), floats=True),
+                         'float32')
+        self.assertEqual(get_downcast_dtype(models.SmallIntegerField(),
+                                            null=True, connection=bounded),
+                         'Int16')
+        # Values outside the range of the field are not wrapped around
+        self.assertRaises(TypeError, cast_series,
+                          pd.Series([1, 70000]), 'int16')
+
+    def test_categorize(self):
+        qs = TradeLog.objects.order_by('pk')
+        cols = ['trader', 'symbol', 'note__note', 'price']
+        expected = read_frame(qs, cols)
+        df = read_frame(qs, cols, categorize=2)
+        # Labels selected in the query with at most 2 distinct values
+        self.assertEqual(df.symbol.dtype, 'category')
+        self.assertEqual(list(df.symbol.cat.categories),
+                         ['999901-ABC', '999907-ZYZ'])
+        self.assertEqual(df.note__note.dtype, object)
+        self.assertEqual(df.trader.dtype, object)
+        self.assertEqual(df.symbol.tolist()[2:], expected.symbol.tolist()[2:])
+        self.assertTrue(df.symbol.iloc[:2].isna().all())
+        pd.testing.assert_frame_equal(df.drop(columns='symbol'),
+                                      expected.drop(columns='symbol'))
+
+        df = read_frame(qs, cols, categorize=['trader', 'note__note'],
+                        dtypes={'note__note': 'object'})
+        self.assertEqual(df.trader.dtype, 'category')
+        self.assertEqual(df.note__note.dtype, object)
+        self.assertEqual(df.trader.tolist(), expected.trader.tolist())
+        self.assertRaises(ValueError, read_frame, qs, cols,
+                          categorize=['volume'])
+        self.assertRaises(ValueError, read_frame, qs, cols, categorize=0)
+
+    def test_categorical_builder(self):
+        builder = CategoricalBuilder()
+        builder.extend(['b', 'a', None])
+        builder.extend(['a', 'c'])
+        result = builder.result()
+        self.assertEqual(list(result.categories), ['a', 'b', 'c'])
+        self.assertEqual(list(result.astype(object)),
+                         ['b', 'a', np.nan, 'a', 'c'])
+
+        builder = CategoricalBuilder(max_categories=2)
+        builder.extend(['b', 'a', None])
+        builder.extend(['c'])
+        builder.extend(['a'])
+        self.assertEqual(builder.result(), ['b', 'a', None, 'c', 'a'])
+        self.assertEqual(len(CategoricalBuilder().result()), 0)
+
+    @override_settings(USE_TZ=True)
+    def test_dtypes_aware_datetimes(self):
+        df = read_frame(TradeLog.objects.all(), ['log_datetime'],
+                        dtypes='auto')
+        self.assertEqual(df.log_datetime.dtype, 'datetime64[ns, UTC]')
+
+    def test_read_frame_iter_dtypes(self):
+        qs = TradeLog.objects.order_by('pk')
+        chunks = list(read_frame_iter(qs, ['symbol'], verbose=False,
+                                      dtypes='auto', chunk_size=2))
+        self.assertTrue(all(c.symbol.dtype == 'Int64' for c in chunks))
+
+    @skipIf(pa is None, 'pyarrow is not installed')
+    def test_read_arrow_expressions(self):
+        qs = TradeLog.objects.order_by('pk')
+        table = read_arrow(qs.values('trader').annotate(s=Sum('volume'))
+                           .order_by('trader'))
+        self.assertEqual(table.column('s').to_pylist(), [1200, 1200])
+        self.assertTrue(pa.types.is_integer(table.schema.field('s').type))
+
+        table = read_arrow(qs.values('price', 'trader__id'))
+        self.assertEqual(table.column('trader__id').to_pylist(),
+                         list(qs.values_list('trader__id', flat=True)))
+
+        annotated = qs.annotate(dbl=F('volume') * 2)
+        table = read_arrow(annotated)
+        self.assertEqual(table.column_names[-1], 'dbl')
+        self.assertEqual(table.column('dbl').to_pylist(), [600] * 8)
+        df = read_frame(annotated, backend='pyarrow')
+        self.assertEqual(df.dbl.tolist(), [600] * 8)
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(annotated.to_parquet(
+                os.path.join(tmp, 'a.parquet')), 8)
+            self.assertEqual(annotated.to_feather(
+                os.path.join(tmp, 'a.feather')), 8)
+
+        # The first rows have no symbol: the types of spanned fields and
+        # expressions come from their fields, not from the first batch
+        table = read_arrow(qs.values('price', 'symbol__isin'), chunk_size=1)
+        self.assertEqual(table.schema.field('symbol__isin').type,
+                         pa.string())
+        self.assertEqual(table.column('symbol__isin').to_pylist(),
+                         list(qs.values_list('symbol__isin', flat=True)))
+        cased = qs.annotate(traded=Case(
+            When(symbol=None, then=None), default=F('volume'),
+            output_field=IntegerField()))
+        table = read_arrow(cased, ['price', 'traded'], chunk_size=1)
+        self.assertEqual(table.schema.field('traded').type, pa.int64())
+        self.assertEqual(arrow_schema(cased, ['price', 'traded']),
+                         table.schema)
+        # Types only known from the data are inferred from the first non
+        # null values
+        extra = qs.extra(select={'isin': 'SELECT isin FROM tests_security '
+                                 'WHERE id = tests_tradelog.symbol_id'})
+        self.assertIsNone(arrow_schema(extra.values('price', 'isin')))
+        table = read_arrow(extra.values('price', 'isin'), chunk_size=1)
+        self.assertEqual(table.schema.field('isin').type, pa.string())
+        self.assertEqual(table.column('isin').to_pylist(),
+                         list(qs.values_list('symbol__isin', flat=True)))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cased.parquet')
+            self.assertEqual(cased.to_parquet(path, ['price', 'traded'],
+                                              row_group_size=1), 8)
+            self.assertEqual(cased.to_feather(
+                os.path.join(tmp, 'cased.feather'), ['price', 'traded'],
+                chunk_size=1), 8)
+
+    @skipIf(pa is None, 'pyarrow is not installed')
+    def test_read_arrow(self):
+        qs = TradeLog.objects.order_by('pk')
+        cols = ['trader', 'symbol', 'log_datetime', 'price', 'volume']
+        table = read_arrow(qs, cols, index_col='id', chunk_size=3)
+        self.assertEqual(table.column_names, cols + ['id'])
+        self.assertEqual(table.column('price').num_chunks, 3)
+        self.assertEqual(table.schema.field('log_datetime').type,
+                         pa.timestamp('us'))
+        self.assertEqual(table.schema.field('trader').type,
+                         pa.dictionary(pa.int32(), pa.string()))
+        self.assertEqual(table.column('symbol').null_count, 2)
+        expected = read_frame(qs, cols, index_col='id')
+        self.assertEqual(table.column('trader').to_pylist(),
+                         expected.trader.tolist())
+        self.assertEqual(table.column('symbol').to_pylist(),
+                         expected.symbol.tolist())
+
+        raw = read_arrow(qs, cols, verbose=False)
+        self.assertEqual(raw.schema.field('trader').type, pa.int64())
+        self.assertEqual(raw.column('symbol').to_pylist(),
+                         list(qs.values_list('symbol', flat=True)))
+
+        df = qs.to_dataframe(cols, index='id', backend='pyarrow')
+        self.assertTrue(all(isinstance(dtype, pd.ArrowDtype)
+                            for dtype in df.dtypes))
+        self.assertEqual(df.symbol.isna().sum(), 2)
+        pd.testing.assert_frame_equal(
+            df.astype(object).where(df.notna(), None),
+            expected.astype(object).where(expected.notna(), None),
+            check_index_type=False)
+        self.assertEqual(qs.to_arrow(cols), read_arrow(qs, cols))
+
+    @skipIf(pa is None, 'pyarrow is not installed')
+    def test_to_parquet_and_feather(self):
+        import pyarrow.feather
+        import pyarrow.parquet
+        qs = TradeLog.objects.order_by('pk')
+        cols = ['trader', 'symbol', 'log_datetime', 'price']
+        expected = read_frame(qs, cols)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'trades.parquet')
+            self.assertEqual(qs.to_parquet(path, cols, row_group_size=3), 8)
+            parquet = pyarrow.parquet.ParquetFile(path)
+            self.assertEqual(parquet.metadata.num_row_groups, 3)
+            self.assertEqual(parquet.read().column('trader').to_pylist(),
+                             expected.trader.tolist())
+
+            path = os.path.join(tmp, 'trades.feather')
+            self.assertEqual(qs.to_feather(path, cols, chunk_size=3), 8)
+            table = pyarrow.feather.read_table(path)
+            self.assertEqual(table.schema.field('trader').type, pa.string())
+            self.assertEqual(table.column('symbol').to_pylist(),
+                             [s if isinstance(s, str) else None
+                              for s in expected.symbol])
+
+            path = os.path.join(tmp, 'empty.parquet')
+            self.assertEqual(qs.none().to_parquet(path, cols), 0)
+            self.assertEqual(
+                pyarrow.parquet.read_table(path).column_names, cols)
+            # The schema comes from the fields, not from the rows
+            schema = pyarrow.parquet.read_schema(path)
+            self.assertEqual(schema.field('price').type, pa.float64())
+            self.assertEqual(schema.field('log_datetime').type,
+                             arrow_schema(qs, cols).field('log_datetime').type)
+            annotated = qs.annotate(dbl=F('volume') * 2).none()
+            self.assertEqual(annotated.to_parquet(path, ['price', 'dbl']), 0)
+            self.assertEqual(
+                pyarrow.parquet.read_schema(path).field('dbl').type,
+                pa.int64())
+
+    def test_snapshot(self):
+        qs = TradeLog.objects.order_by('pk')
+        cols = ['trader', 'symbol', 'log_datetime', 'price', 'volume']
+        expected = read_frame(qs, cols, index_col='id', dtypes='auto')
+        with tempfile.TemporaryDirectory() as tmp:
+            metadata = qs.snapshot(tmp, cols, index='id', dtypes='auto')
+            self.assertEqual(metadata['rows'], 8)
+            df = load_snapshot(tmp)
+            pd.testing.assert_frame_equal(df.copy(), expected)
+            self.assertIsInstance(df.price.values, np.memmap)
+            self.assertIsInstance(df.volume.array._data, np.memmap)
+            self.assertEqual(df.attrs['snapshot']['sql'], str(qs.query))
+
+            self.assertFalse(qs.is_snapshot_stale(tmp))
+            TradeLog.objects.last().delete()
+            self.assertTrue(qs.is_snapshot_stale(tmp))
+
+            qs.snapshot(tmp, cols)
+            reloaded = load_snapshot(tmp)
+            expected_reloaded = read_frame(qs, cols)
+            pd.testing.assert_frame_equal(reloaded.copy(), expected_reloaded)
+            # The frame loaded before the rewrite still maps the old files
+            pd.testing.assert_frame_equal(df.copy(), expected)
+
+            qs.first().delete()
+            qs.snapshot(tmp, cols)
+            pd.testing.assert_frame_equal(load_snapshot(tmp).copy(),
+                                          read_frame(qs, cols))
+            pd.testing.assert_frame_equal(reloaded.copy(), expected_reloaded)
+            # Only the current and the previous data are kept
+            self.assertEqual(
+                len([name for name in os.listdir(tmp)
+                     if name.startswith('data-')]), 2)
+
+    @skipIf(pa is None, 'pyarrow is not installed')
+    def test_read_arrow_choices(self):
+        MyModelChoice.objects.create(col1=2, col2=1.5)
+        MyModelChoice.objects.create(col1=1, col2=None)
+        table = read_arrow(MyModelChoice.objects.order_by('pk'),
+                           ['col1', 'col2'])
+        self.assertEqual(table.column('col1').to_pylist(),
+                         [u'Second \U0001f948', u'First \U0001f947'])
+        self.assertEqual(table.column('col2').to_pylist(), [1.5, None])
+
+    async def test_aread_frame(self):
+        qs = TradeLog.objects.order_by('pk')
+        cols = ['trader', 'symbol', 'price']
+        for verbose in (True, False):
+            df = await aread_frame(qs, cols, index_col='note__note',
+                                   verbose=verbose, chunk_size=3)
+            expected = await sync_to_async(read_frame)(
+                qs, cols, index_col='note__note', verbose=verbose)
+            pd.testing.assert_frame_equal(df, expected)
+
+        for values, kwargs in ((qs.values('trader', 'price'), {}),
+                               (qs.values_list('price', flat=True), {}),
+                               (qs, {'fieldnames': cols, 'dtypes': 'auto'})):
+            pd.testing.assert_frame_equal(
+                await aread_frame(values, chunk_size=3, **kwargs),
+                await sync_to_async(read_frame)(values, **kwargs))
+
+        # Only the verbose rendering, which looks labels up, runs in the
+        # thread of the database connection
+        calls = []
+
+        def record(func, thread_sensitive=True):
+            calls.append((func.__name__, thread_sensitive))
+            return sync_to_async(func, thread_sensitive=thread_sensitive)
+
+        with mock.patch('django_pandas.io.sync_to_async', record):
+            await aread_frame(qs, cols, index_col='note__note', chunk_size=5)
+        self.assertEqual(calls, [
+            ('fetch_chunk', True), ('fetch_chunk', True),
+            ('fetch_chunk', True), ('frame_from_columns', False),
+            ('finish_frame', True), ('finish_frame', False)])
+
+    def test_read_frame_iter(self):
+        qs = TradeLog.objects.all()
+        cols = ['log_datetime', 'symbol', 'trader', 'price']
+        chunks = list(read_frame_iter(qs, cols, index_col='note__note',
+                                      chunk_size=3))
+        self.assertEqual([len(c) for c in chunks], [3, 3, 2])
+        for chunk in chunks:
+            self.assertEqual(list(chunk.columns), cols)
+        pd.testing.assert_frame_equal(
+            pd.concat(chunks),
+            read_frame(qs, cols, index_col='note__note'))
+        self.assertEqual(list(read_frame_iter(qs.none())), [])
+
     def test_many_to_many(self):
         qs = Portfolio.objects.all()
         cols = ['name', 'securities__symbol', 'securities__tradelog__log_datetime']
@@ -241,3 +799,149 @@ class RelatedFieldsTest(TestCase):
                 df.iloc[idx].tolist(),
                 list(row)
             )
+
+    def test_only_defer(self):
+        qs = TradeLog.objects.all()
+        with CaptureQueriesContext(connection) as queries:
+            df = read_frame(qs.defer('note', 'volume'), verbose=False)
+        self.assertEqual(list(df.columns),
+                         ['id', 'trader', 'symbol', 'log_datetime', 'price'])
+        self.assertNotIn('note_id', queries[0]['sql'])
+        self.assertNotIn('volume', queries[0]['sql'])
+
+        df = read_frame(qs.only('price', 'trader__name'), verbose=False)
+        self.assertEqual(list(df.columns), ['id', 'trader', 'price'])
+        df = read_frame(qs.only('price'), index_col='log_datetime')
+        self.assertEqual(list(df.columns), ['id', 'price'])
+        self.assertEqual(df.index.name, 'log_datetime')
+        # Explicit field names are read regardless of the deferred fields
+        df = read_frame(qs.only('price'), ['price', 'volume'])
+        self.assertEqual(list(df.columns), ['price', 'volume'])
+        self.assertEqual(list(read_frame(qs).columns),
+                         ['id', 'trader', 'symbol', 'log_datetime', 'price',
+                          'volume', 'note'])
+
+    def test_non_field_names(self):
+        qs = TradeLog.objects.order_by('pk')
+        with self.assertNumQueries(1):
+            df = read_frame(qs, ['price', 'not_a_field'], verbose=False)
+        self.assertEqual(df.price.tolist(), [30.0] * 8)
+        self.assertEqual(df.not_a_field.tolist(), [None] * 8)
+
+    def test_raw_queryset(self):
+        qs = Trader.objects.raw('SELECT * FROM tests_trader ORDER BY id')
+        traders = list(qs)
+        df = read_frame(traders)
+        self.assertEqual(list(df.columns), ['id', 'name'])
+        self.assertEqual(df.name.tolist(), ['Jim Brown', 'Fred Fish'])
+        # The instances are left intact
+        self.assertTrue(all(hasattr(t, '_state') for t in traders))
+        traders[0].save()
+
+    def test_frame_signals(self):
+        phases, reads = [], []
+
+        def on_phase(sender, **kwargs):
+            phases.append((sender, kwargs['source'], kwargs['phase'],
+                           kwargs['queries']))
+
+        def on_read(sender, **kwargs):
+            reads.append(dict(kwargs, sender=sender))
+
+        frame_phase.connect(on_phase, sender=TradeLog)
+        frame_read.connect(on_read, sender=TradeLog)
+        try:
+            df = read_frame(TradeLog.objects.all(), ['trader', 'price'],
+                            index_col='log_datetime', datetime_index=True)
+            read_frame(Trader.objects.all())
+        finally:
+            frame_phase.disconnect(on_phase, sender=TradeLog)
+            frame_read.disconnect(on_read, sender=TradeLog)
+
+        self.assertEqual(
+            phases,
+            [(TradeLog, 'read_frame', 'fetch', 1),
+             (TradeLog, 'read_frame', 'build', 0),
+             (TradeLog, 'read_frame', 'verbose', 1),
+             (TradeLog, 'read_frame', 'index', 0)])
+        self.assertEqual(len(reads), 1)
+        read = reads[0]
+        self.assertEqual(list(read['phases']),
+                         ['fetch', 'build', 'verbose', 'index'])
+        self.assertEqual((read['rows'], read['columns'], read['queries']),
+                         (8, 2, 2))
+        self.assertEqual(read['nbytes'],
+                         df.memory_usage(index=True, deep=False).sum())
+        self.assertGreaterEqual(read['seconds'], sum(read['phases'].values()))
+
+        # No timing at all without receivers
+        with mock.patch('django_pandas.signals.FrameTimer') as timer:
+            read_frame(TradeLog.objects.all())
+        timer.assert_not_called()
+
+
+class ParallelReadTest(TransactionTestCase):
+
+    def setUp(self):
+        traders = [Trader.objects.create(name=name)
+                   for name in ('Jim Brown', 'Fred Fish')]
+        abc = Security.objects.create(symbol='ABC', isin='999901')
+        for i in range(10):
+            TradeLog.objects.create(
+                trader=traders[i % 2], symbol=abc if i % 3 else None,
+                log_datetime='2013-01-01T09:%02d:00' % i, price=30 + i,
+                volume=300, note=TradeLogNote.objects.create(note='n%d' % i))
+
+    def test_partition_ranges(self):
+        qs = TradeLog.objects.all()
+        ranges = partition_ranges(qs, 3)
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(sum(qs.filter(pk__gte=low, pk__lt=high).count()
+                             for low, high in ranges), 10)
+        self.assertIsNone(partition_ranges(qs[:5], 3))
+        self.assertIsNone(partition_ranges(qs.none(), 3))
+        with transaction.atomic():
+            self.assertIsNone(partition_ranges(qs, 3))
+
+    def test_parallel_unpartitionable(self):
+        qs = TradeLog.objects.all()
+        cases = [
+            qs.values('trader').annotate(total=Sum('volume')),
+            qs.values('trader').distinct(),
+            qs.order_by('-price'),
+            qs.order_by('trader', 'pk'),
+            qs.filter(price__lt=33).union(qs.filter(price__gt=36)),
+        ]
+        for case in cases:
+            self.assertIsNone(partition_ranges(case, 3))
+            pd.testing.assert_frame_equal(read_frame(case, parallel=3),
+                                          read_frame(case))
+        df = read_frame(cases[0], parallel=3)
+        self.assertEqual(df.total.tolist(), [1500, 1500])
+        df = read_frame(cases[2], parallel=3)
+        self.assertEqual(df.price.tolist(), list(range(39, 29, -1)))
+        self.assertEqual(len(partition_ranges(qs.order_by('id'), 3)), 3)
+
+    def test_parallel(self):
+        qs = TradeLog.objects.order_by('pk')
+        cols = ['trader', 'symbol', 'price', 'note__note']
+        for engine in ('default', 'cursor'):
+            for verbose in (True, False):
+                pd.testing.assert_frame_equal(
+                    read_frame(qs, cols, index_col='log_datetime',
+                               verbose=verbose, engine=engine, parallel=4),
+                    read_frame(qs, cols, index_col='log_datetime',
+                               verbose=verbose, engine=engine))
+        pd.testing.assert_frame_equal(
+            read_frame(qs.filter(price__gt=35), parallel=3),
+            read_frame(qs.filter(price__gt=35)))
+        pd.testing.assert_frame_equal(
+            read_frame(qs, cols, categorize=['symbol', 'note__note'],
+                       parallel=4),
+            read_frame(qs, cols, categorize=['symbol', 'note__note']))
+        # The first partition holds the last name in sorted order
+        traders = Trader.objects.order_by('pk')
+        self.assertEqual(traders.first().name, 'Jim Brown')
+        pd.testing.assert_frame_equal(
+            read_frame(traders, categorize=['name'], parallel=2),
+            read_frame(traders, categorize=['name']))
@@ -1,16 +1,25 @@
-from datetime import datetime
+from datetime import date, datetime
 
-from django.test import TestCase
+from django.apps import apps
+from django.db import connection
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 import pandas as pd
 import numpy as np
 import pickle
 import django
 from pandas.core.indexes.datetimes import bdate_range
 
+from django_pandas.signals import frame_read
+from django_pandas.utils import long_to_wide, FRAME_VERSION_KEY
 from .models import (
     DataFrame, WideTimeSeries, WideTimeSeriesDateField,
-    LongTimeSeries, PivotData, Dude, Car, Spot
+    LongTimeSeries, PivotData, Dude, Car, Spot, MyModelChoice, Trader,
+    Security, TradeLog, TradeLogNote, Portfolio, Holding
 )
+from unittest import mock
+from asgiref.sync import sync_to_async
 try:
     import pandas._testing as tm
 except ImportError:
@@ -63,6 +72,22 @@ class DataFrameTest(TestCase):
         n, c = df2.shape
         self.assertEqual((n, c), (3, 3))
 
+    def test_iter_dataframes(self):
+        qs = DataFrame.objects.order_by('index')
+        frames = list(qs.iter_dataframes(['col1', 'col2'], index='index',
+                                         chunk_size=4))
+        self.assertEqual([len(df) for df in frames], [4, 3])
+        tm.assert_frame_equal(pd.concat(frames),
+                              qs.to_dataframe(['col1', 'col2'], index='index'))
+
+    async def test_ato_dataframe(self):
+        qs = DataFrame.objects.order_by('index')
+        df = await qs.ato_dataframe(['col1', 'col2'], index='index',
+                                    chunk_size=3)
+        expected = await sync_to_async(qs.to_dataframe)(['col1', 'col2'],
+                                                        index='index')
+        tm.assert_frame_equal(df, expected)
+
 
 class TimeSeriesTest(TestCase):
     def unpivot(self, frame):
@@ -127,6 +152,15 @@ class TimeSeriesTest(TestCase):
         self.assertIsInstance(df.index, pd.DatetimeIndex)
         self.assertIsNone(df.index.freq)
 
+    def test_widestorage_downcast(self):
+        qs = WideTimeSeries.objects.all()
+        df = qs.to_timeseries(index='date_ix', downcast='float')
+        self.assertEqual(df.dtypes.astype(str).to_dict(), {
+            'id': 'int64', 'col1': 'float32', 'col2': 'float32',
+            'col3': 'float32', 'col4': 'float32'})
+        tm.assert_frame_equal(df, qs.to_timeseries(index='date_ix'),
+                              check_dtype=False, rtol=1e-6)
+
     def test_widestorage_datefield(self):
 
         qs = WideTimeSeriesDateField.objects.all()
@@ -147,6 +181,69 @@ class TimeSeriesTest(TestCase):
         self.assertIsInstance(df.index, pd.DatetimeIndex)
         self.assertIsNone(df.index.freq)
 
+    def test_longstorage_categorize(self):
+        qs = LongTimeSeries.objects.all()
+        kwargs = {'index': 'date_ix', 'pivot_columns': 'series_name',
+                  'values': 'value', 'storage': 'long'}
+        df = qs.to_dataframe(['series_name', 'value'], categorize=10)
+        self.assertEqual(df.series_name.dtype, 'category')
+        tm.assert_frame_equal(
+            qs.to_timeseries(categorize=['series_name'], **kwargs),
+            qs.to_timeseries(**kwargs))
+
+    def test_longstorage_multiple_pivot_columns(self):
+        qs = LongTimeSeries.objects.all()
+        df = qs.to_timeseries(index='date_ix', pivot_columns=['series_name'],
+                              values='value', storage='long')
+        self.assertEqual(list(df.columns), ['A.value', 'B.value',
+                                            'C.value', 'D.value'])
+        tm.assert_series_equal(
+            df['A.value'],
+            qs.to_timeseries(index='date_ix', pivot_columns='series_name',
+                             values='value', storage='long')['A'],
+            check_names=False)
+        df = qs.to_timeseries(index='date_ix', pivot_columns=['series_name'],
+                              values='value', storage='long',
+                              multiindex_columns=True)
+        self.assertEqual(list(df.columns), ['A', 'B', 'C', 'D'])
+
+    def test_long_to_wide(self):
+        long = pd.DataFrame({
+            'date': pd.to_datetime(['2001-01-02', '2001-01-01', '2001-01-01',
+                                    '2001-01-02', '2001-01-01']),
+            'country': ['us', 'us', 'uk', 'uk', 'uk'],
+            'series': ['gdp', 'gdp', 'cpi', 'gdp', 'gdp'],
+            'value': [1.0, 2.0, 3.0, np.nan, 5.0],
+        })
+        df = long_to_wide(long[long.series == 'gdp'], 'date', 'country',
+                          'value')
+        tm.assert_frame_equal(
+            df, long[long.series == 'gdp'].pivot(
+                index='date', columns='country', values='value'))
+
+        df = long_to_wide(long, 'date', ['country', 'series'], 'value')
+        self.assertEqual(list(df.columns), ['UK.CPI.value', 'UK.GDP.value',
+                                            'US.GDP.value'])
+        self.assertEqual(df.loc['2001-01-01'].tolist(), [3.0, 5.0, 2.0])
+        df = long_to_wide(long, 'date', ['country', 'series'], 'value',
+                          multiindex=True)
+        self.assertEqual(df.columns.tolist(),
+                         [('uk', 'cpi'), ('uk', 'gdp'), ('us', 'gdp')])
+
+        self.assertRaises(ValueError, long_to_wide, long, 'date', 'country',
+                          'value')
+        for aggfunc in ('sum', 'mean', 'count', 'min', 'max'):
+            tm.assert_frame_equal(
+                long_to_wide(long, 'date', 'country', 'value',
+                             aggfunc=aggfunc),
+                long.pivot_table(index='date', columns='country',
+                                 values='value', aggfunc=aggfunc),
+                check_dtype=False)
+        df = long_to_wide(long, 'date', 'country', 'value', aggfunc='first')
+        self.assertEqual(df.loc['2001-01-01', 'uk'], 3.0)
+        df = long_to_wide(long, 'date', 'country', 'value', aggfunc='last')
+        self.assertEqual(df.loc['2001-01-01', 'uk'], 5.0)
+
     def test_resampling(self):
         qs = LongTimeSeries.objects.all()
         agg_args = None
@@ -187,6 +284,67 @@ class TimeSeriesTest(TestCase):
 
         self.assertIsInstance(df1.index, pd.PeriodIndex)
 
+    async def test_ato_timeseries(self):
+        freq = 'ME' if PANDAS_VERSIONINFO >= '2.2.0' else 'M'
+        cases = [
+            (LongTimeSeries, {'storage': 'long', 'values': 'value',
+                              'pivot_columns': 'series_name'}),
+            (WideTimeSeries, {'storage': 'wide', 'freq': freq,
+                              'agg_kwargs': {'func': 'sum'}}),
+            (WideTimeSeries, {'storage': 'wide', 'freq': freq,
+                              'agg_kwargs': {'func': 'sum'},
+                              'pushdown': True}),
+        ]
+        for model, kwargs in cases:
+            qs = model.objects.all()
+            expected = await sync_to_async(qs.to_timeseries)(index='date_ix',
+                                                             **kwargs)
+            tm.assert_frame_equal(
+                await qs.ato_timeseries(index='date_ix', **kwargs), expected)
+
+    def test_resampling_pushdown(self):
+        if PANDAS_VERSIONINFO >= '2.2.0':
+            freqs = ['h', 'D', 'W', 'ME', 'MS', 'QE', 'YE']
+        else:
+            freqs = ['H', 'D', 'W', 'M', 'MS', 'Q', 'A']
+        querysets = [
+            (WideTimeSeries.objects.all(), {'storage': 'wide'}),
+            (WideTimeSeries.objects.all(), {'storage': 'wide',
+                                            'fieldnames': ['col1', 'col3']}),
+            (WideTimeSeriesDateField.objects.all(),
+             {'storage': 'wide', 'fieldnames': ['col2']}),
+            (LongTimeSeries.objects.all(), {'storage': 'long',
+                                            'pivot_columns': 'series_name',
+                                            'values': 'value'}),
+            (LongTimeSeries.objects.all(), {'storage': 'long',
+                                            'pivot_columns': ['series_name'],
+                                            'values': 'value'}),
+        ]
+        for qs, kwargs in querysets:
+            for freq in freqs:
+                if freq in ('h', 'H') and qs.model is WideTimeSeriesDateField:
+                    continue
+                for func in ('sum', 'mean', 'count', 'min', 'max'):
+                    with self.assertNumQueries(1):
+                        df = qs.to_timeseries(
+                            index='date_ix', freq=freq, pushdown=True,
+                            agg_kwargs={'func': func}, **kwargs)
+                    tm.assert_frame_equal(
+                        df, qs.to_timeseries(index='date_ix', freq=freq,
+                                             agg_kwargs={'func': func},
+                                             **kwargs),
+                        check_dtype=False)
+
+    def test_resampling_pushdown_fallback(self):
+        qs = WideTimeSeries.objects.all()
+        for kwargs in ({'freq': '2D', 'agg_kwargs': {'func': 'sum'}},
+                       {'freq': 'D', 'agg_kwargs': {'func': 'median'}},
+                       {'freq': 'D', 'agg_args': ['sum'],
+                        'rs_kwargs': {'closed': 'right'}}):
+            tm.assert_frame_equal(
+                qs.to_timeseries(index='date_ix', pushdown=True, **kwargs),
+                qs.to_timeseries(index='date_ix', **kwargs))
+
     def test_bad_args_wide_ts(self):
         qs = WideTimeSeries.objects.all()
         rs_kwargs = {'how': 'sum', 'kind': 'period'}
@@ -269,6 +427,393 @@ class PivotTableTest(TestCase):
         self.assertEqual(pt.index.names, rows)
         self.assertEqual(pt.columns.names, cols)
 
+    async def test_ato_pivot_table(self):
+        qs = PivotData.objects.all()
+        kwargs = {'values': 'value_col_d', 'rows': ['row_col_a', 'row_col_b'],
+                  'cols': ['row_col_c']}
+        expected = await sync_to_async(qs.to_pivot_table)(**kwargs)
+        for pushdown in (False, True):
+            tm.assert_frame_equal(
+                await qs.ato_pivot_table(pushdown=pushdown, **kwargs),
+                expected)
+
+    def test_pivot_pushdown(self):
+        qs = PivotData.objects.all()
+        cases = [
+            {'values': 'value_col_d', 'rows': ['row_col_a', 'row_col_b'],
+             'cols': ['row_col_c']},
+            {'values': ['value_col_d', 'value_col_e'], 'rows': 'row_col_a',
+             'cols': ['row_col_b', 'row_col_c']},
+            {'values': 'value_col_f', 'rows': ['row_col_a', 'row_col_c']},
+            {'values': 'value_col_d', 'rows': ['row_col_a'],
+             'cols': ['row_col_b', 'row_col_c'], 'fill_value': 0},
+        ]
+        aggfuncs = ['sum', 'mean', 'count', 'min', 'max', ['sum', 'mean'],
+                    'average']
+        for kwargs in cases:
+            for aggfunc in aggfuncs:
+                with self.assertNumQueries(2 if aggfunc == ['sum', 'mean']
+                                           else 1):
+                    pt = qs.to_pivot_table(aggfunc=aggfunc, pushdown=True,
+                                           **kwargs)
+                tm.assert_frame_equal(
+                    pt, qs.to_pivot_table(
+                        aggfunc='mean' if aggfunc == 'average' else aggfunc,
+                        **kwargs),
+                    check_dtype=False)
+
+    def test_pivot_pushdown_fallback(self):
+        qs = PivotData.objects.all()
+        kwargs = {'values': 'value_col_d', 'rows': ['row_col_a'],
+                  'cols': ['row_col_c']}
+        for extra in ({'aggfunc': 'median'}, {'margins': True},
+                      {'aggfunc': lambda x: x.max() - x.min()}):
+            kwargs.update(extra)
+            tm.assert_frame_equal(
+                qs.to_pivot_table(pushdown=True, **kwargs),
+                qs.to_pivot_table(**kwargs))
+
+    def test_pivot_signals(self):
+        reads = []
+
+        def on_read(sender, **kwargs):
+            reads.append((kwargs['source'], list(kwargs['phases']),
+                          kwargs['queries']))
+
+        frame_read.connect(on_read, sender=PivotData)
+        try:
+            kwargs = {'values': 'value_col_d', 'rows': ['row_col_a'],
+                      'cols': ['row_col_c']}
+            PivotData.objects.to_pivot_table(**kwargs)
+            PivotData.objects.to_pivot_table(pushdown=True, **kwargs)
+        finally:
+            frame_read.disconnect(on_read, sender=PivotData)
+        self.assertEqual(reads, [
+            ('read_frame', ['fetch', 'build', 'verbose'], 1),
+            ('to_pivot_table', ['read', 'pivot'], 1),
+            ('read_frame', ['fetch', 'build', 'verbose'], 1),
+            ('to_pivot_table', ['pushdown'], 1),
+        ])
+
+
+class WriteFrameTest(TestCase):
+
+    def setUp(self):
+        self.fred = Trader.objects.create(name='Fred')
+        self.ibm = Security.objects.create(symbol='IBM', isin='US459200')
+        self.notes = [TradeLogNote.objects.create(note=str(i))
+                      for i in range(3)]
+        TradeLog.objects.create(trader=self.fred, symbol=self.ibm,
+                                log_datetime=datetime(2024, 1, 1),
+                                price=10.0, volume=5, note=self.notes[0])
+
+    def test_from_dataframe(self):
+        df = pd.DataFrame({
+            'col1': pd.Categorical([u'Second \U0001f948', u'First \U0001f947']),
+            'col2': [1.5, np.nan],
+        })
+        stats = MyModelChoice.objects.from_dataframe(df)
+        self.assertEqual((stats['rows'], stats['inserted'], stats['updated']),
+                         (2, 2, 0))
+        self.assertEqual(
+            list(MyModelChoice.objects.order_by('pk').values_list(
+                'col1', 'col2')), [(2, 1.5), (1, None)])
+
+    def test_from_dataframe_labels(self):
+        df = TradeLog.objects.to_dataframe(
+            ['trader', 'symbol', 'log_datetime', 'price', 'volume'])
+        df['note'] = self.notes[1].pk
+        stats = TradeLog.objects.from_dataframe(df)
+        self.assertEqual(stats['inserted'], 1)
+        log = TradeLog.objects.get(note=self.notes[1])
+        self.assertEqual((log.trader, log.symbol), (self.fred, self.ibm))
+
+        df['trader'] = 'Barney'
+        with self.assertRaises(ValueError):
+            TradeLog.objects.from_dataframe(df)
+
+    def test_from_dataframe_label_lookup(self):
+        Trader.objects.create(name='Wilma')
+        df = TradeLog.objects.to_dataframe(
+            ['trader', 'symbol', 'log_datetime', 'price', 'volume'])
+        df['note'] = self.notes[1].pk
+        # Only the labels in the frame are looked up, by the name field
+        with CaptureQueriesContext(connection) as queries:
+            TradeLog.objects.from_dataframe(df)
+        trader_queries = [q['sql'] for q in queries
+                          if 'tests_trader' in q['sql']]
+        self.assertEqual(len(trader_queries), 1)
+        self.assertIn('IN', trader_queries[0])
+
+        # Categorical primary keys are not labels
+        df = TradeLog.objects.filter(note=self.notes[0]).to_dataframe(
+            ['trader', 'symbol', 'log_datetime', 'price', 'volume'],
+            verbose=False, dtypes={'trader': 'category'})
+        df['note'] = self.notes[2].pk
+        TradeLog.objects.from_dataframe(df)
+        self.assertEqual(TradeLog.objects.get(note=self.notes[2]).trader,
+                         self.fred)
+
+        Trader.objects.create(name='Fred')
+        df = TradeLog.objects.filter(note=self.notes[0]).to_dataframe(
+            ['trader', 'symbol', 'log_datetime', 'price', 'volume'])
+        with self.assertRaisesRegex(ValueError, 'Ambiguous'):
+            TradeLog.objects.from_dataframe(df)
+
+    def test_bulk_upsert(self):
+        df = TradeLog.objects.to_dataframe(
+            ['id', 'trader', 'symbol', 'log_datetime', 'price', 'volume',
+             'note'], index='id', verbose=False)
+        new = df.copy()
+        new.index = pd.Index([None], name='id')
+        new['note'] = self.notes[2].pk
+        new['symbol'] = np.nan
+        df = pd.concat([df, new])
+
+        features = connection.features
+        for supported, price, inserted in ((True, 11.0, 1), (False, 12.0, 0)):
+            df['price'] = price
+            with mock.patch.object(features,
+                                   'supports_update_conflicts_with_target',
+                                   supported):
+                stats = TradeLog.objects.bulk_upsert(df,
+                                                     unique_fields=['note'])
+            self.assertEqual((stats['rows'], stats['inserted'],
+                              stats['updated']), (2, inserted, 2 - inserted))
+            self.assertEqual(
+                list(TradeLog.objects.order_by('note').values_list(
+                    'note', 'symbol', 'price')),
+                [(self.notes[0].pk, self.ibm.pk, price),
+                 (self.notes[2].pk, None, price)])
+
+    def test_update_from_dataframe(self):
+        for note in self.notes[1:]:
+            TradeLog.objects.create(trader=self.fred, symbol=self.ibm,
+                                    log_datetime=datetime(2024, 1, 2),
+                                    price=20.0, volume=5, note=note)
+        df = TradeLog.objects.order_by('pk').to_dataframe(
+            ['price', 'volume', 'symbol'], index='id')
+        df['price'] = [10.0, 21.0, 22.0]
+        df.loc[df.index[2], 'symbol'] = None
+        df.loc[0] = [1.0, 1, None]
+
+        # labels, savepoint, current values, update, release
+        with self.assertNumQueries(5):
+            stats = TradeLog.objects.update_from_dataframe(
+                df, columns=['price', 'symbol'])
+        self.assertEqual(
+            dict((k, stats[k]) for k in
+                 ('rows', 'updated', 'unchanged', 'missing', 'cells')),
+            {'rows': 4, 'updated': 2, 'unchanged': 1, 'missing': 1,
+             'cells': 3})
+        self.assertTrue(all(type(stats[k]) is int for k in
+                            ('rows', 'updated', 'unchanged', 'missing')))
+        self.assertEqual(
+            list(TradeLog.objects.order_by('pk').values_list(
+                'price', 'volume', 'symbol')),
+            [(10.0, 5, self.ibm.pk), (21.0, 5, self.ibm.pk), (22.0, 5, None)])
+
+        stats = TradeLog.objects.update_from_dataframe(
+            df, columns=['price', 'symbol'])
+        self.assertEqual(stats['updated'], 0)
+
+        # Batches are capped to the parameters the backend takes
+        df['price'] = 30.0
+        with mock.patch.object(connection.ops, 'bulk_batch_size',
+                               return_value=2) as bulk_batch_size:
+            # savepoint, current values and update per batch, release
+            with self.assertNumQueries(6):
+                stats = TradeLog.objects.update_from_dataframe(
+                    df, columns=['price'])
+        self.assertEqual(len(bulk_batch_size.call_args[0][0]), 3)
+        self.assertEqual(stats['updated'], 3)
+
+
+class FrameCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.fred = Trader.objects.create(name='Fred')
+        self.ibm = Security.objects.create(symbol='IBM', isin='US459200')
+        TradeLog.objects.create(
+            trader=self.fred, symbol=self.ibm,
+            log_datetime=datetime(2024, 1, 1), price=10.0, volume=5,
+            note=TradeLogNote.objects.create(note='a'))
+
+    def test_cached(self):
+        qs = TradeLog.objects.filter(volume__gt=1).cached(timeout=60)
+        cols = ['trader', 'symbol', 'price']
+        df = qs.to_dataframe(cols)
+        with self.assertNumQueries(0):
+            tm.assert_frame_equal(qs.to_dataframe(cols), df)
+            tm.assert_frame_equal(qs.all().to_dataframe(cols), df)
+        with self.assertNumQueries(1):
+            qs.to_dataframe(['price'])
+        with self.assertNumQueries(1):
+            qs.filter(volume__gt=2).to_dataframe(cols)
+
+        pt = qs.to_pivot_table(values='price', rows=['trader'])
+        with self.assertNumQueries(0):
+            tm.assert_frame_equal(
+                qs.to_pivot_table(values='price', rows=['trader']), pt)
+
+        # frames read back from the cache are writable
+        df = qs.to_dataframe(cols)
+        df.loc[0, 'price'] = 1.0
+        self.assertEqual(qs.to_dataframe(cols).price.tolist(), [10.0])
+
+    def test_invalidation_spans(self):
+        portfolio = Portfolio.objects.create(name='Fund')
+        portfolio.securities.add(self.ibm)
+        portfolios = Portfolio.objects.cached()
+        # A many-to-many span
+        cols = ['name', 'securities__symbol']
+        self.assertEqual(
+            portfolios.to_dataframe(cols).securities__symbol.tolist(),
+            ['IBM'])
+        self.ibm.symbol = 'CHANGED'
+        self.ibm.save()
+        self.assertEqual(
+            portfolios.to_dataframe(cols).securities__symbol.tolist(),
+            ['CHANGED'])
+
+        # Reverse spans
+        cols = ['name', 'securities__tradelog__price']
+        self.assertEqual(
+            portfolios.to_dataframe(cols).securities__tradelog__price
+            .tolist(), [10.0])
+        trade = TradeLog.objects.get()
+        trade.price = 12.0
+        trade.save()
+        self.assertEqual(
+            portfolios.to_dataframe(cols).securities__tradelog__price
+            .tolist(), [12.0])
+        trades = TradeLog.objects.cached()
+        cols = ['price', 'symbol__portfolio__name']
+        self.assertEqual(
+            trades.to_dataframe(cols).symbol__portfolio__name.tolist(),
+            ['Fund'])
+        portfolio.name = 'Other'
+        portfolio.save()
+        self.assertEqual(
+            trades.to_dataframe(cols).symbol__portfolio__name.tolist(),
+            ['Other'])
+
+    def test_cached_protocol_4(self):
+        # Python 3.7 has no pickle protocol 5
+        with mock.patch('django_pandas.utils.FRAME_PICKLE_PROTOCOL', 4):
+            qs = TradeLog.objects.cached()
+            df = qs.to_dataframe(['trader', 'price'])
+            with self.assertNumQueries(0):
+                tm.assert_frame_equal(
+                    qs.to_dataframe(['trader', 'price']), df)
+
+    def test_invalidation(self):
+        qs = TradeLog.objects.cached()
+        self.assertEqual(qs.to_dataframe(['trader']).trader.tolist(),
+                         ['Fred'])
+        self.fred.name = 'Barney'
+        self.fred.save()
+        self.assertEqual(qs.to_dataframe(['trader']).trader.tolist(),
+                         ['Barney'])
+        self.assertEqual(qs.to_dataframe(['price']).price.tolist(), [10.0])
+        TradeLog.objects.update(price=11.0)
+        # Queryset updates send no signals
+        self.assertEqual(qs.to_dataframe(['price']).price.tolist(), [10.0])
+        TradeLog.objects.get().save()
+        self.assertEqual(qs.to_dataframe(['price']).price.tolist(), [11.0])
+
+        portfolio = Portfolio.objects.create(name='Fund')
+        portfolios = Portfolio.objects.cached()
+        cols = ['name', 'securities__symbol']
+        self.assertEqual(
+            portfolios.to_dataframe(cols).securities__symbol.tolist(), [None])
+        portfolio.securities.add(self.ibm)
+        self.assertEqual(
+            portfolios.to_dataframe(cols).securities__symbol.tolist(),
+            ['IBM'])
+
+    def test_invalidation_without_reads(self):
+        # Processes that only write bump the versions of the configured
+        # caches, without having read a cached frame first
+        key = FRAME_VERSION_KEY % Trader._meta.label_lower
+        with mock.patch('django_pandas.utils._frame_cache_aliases', set()), \
+                override_settings(DJANGO_PANDAS_FRAME_CACHES=['default']):
+            apps.get_app_config('django_pandas').ready()
+            cache.set(key, 1, None)
+            self.fred.save()
+            version = cache.get(key)
+            self.assertGreater(version, 1)
+            self.fred.delete()
+            self.assertGreater(cache.get(key), version)
+
+
+class RefreshDataFrameTest(TestCase):
+
+    def setUp(self):
+        self.fred = Trader.objects.create(name='Fred')
+        self.jim = Trader.objects.create(name='Jim')
+        self.ibm = Security.objects.create(symbol='IBM', isin='US459200')
+        self.holdings = [
+            Holding.objects.create(trader=trader, security=self.ibm,
+                                   quantity=i)
+            for i, trader in enumerate([self.fred, self.jim, self.fred])]
+
+    def test_refresh_dataframe(self):
+        qs = Holding.objects.filter(is_deleted=False).order_by('pk')
+        cols = ['trader', 'security', 'quantity', 'modified']
+        df = qs.to_dataframe(cols, index='id')
+
+        self.holdings[0].quantity = 10
+        self.holdings[0].trader = self.jim
+        self.holdings[0].save()
+        self.holdings[1].is_deleted = True
+        self.holdings[1].save()
+        Holding.objects.create(trader=self.fred, security=self.ibm,
+                               quantity=4)
+
+        refreshed = qs.refresh_dataframe(df, fieldnames=cols)
+        tm.assert_frame_equal(refreshed, qs.to_dataframe(cols, index='id'))
+        self.assertEqual(refreshed.trader.tolist(), ['Jim', 'Fred', 'Fred'])
+        self.assertEqual(refreshed.attrs['high_water_mark'],
+                         Holding.objects.latest('modified').modified)
+
+        # Nothing changed since: only the rows at the high-water mark are
+        # read again
+        tm.assert_frame_equal(qs.refresh_dataframe(refreshed,
+                                                   fieldnames=cols),
+                              refreshed)
+
+    def test_refresh_dataframe_deleted_field(self):
+        qs = Holding.objects.order_by('pk')
+        cols = ['trader', 'quantity', 'id']
+        df = qs.to_dataframe(cols)
+        since = Holding.objects.latest('modified').modified
+        self.holdings[2].is_deleted = True
+        self.holdings[2].save()
+
+        refreshed = qs.refresh_dataframe(df, key='id', since=since,
+                                         deleted_field='is_deleted',
+                                         fieldnames=cols)
+        tm.assert_frame_equal(
+            refreshed, qs.filter(is_deleted=False).to_dataframe(cols))
+        with self.assertRaises(ValueError):
+            qs.refresh_dataframe(df, fieldnames=cols, key='id')
+
+    def test_refresh_dataframe_date_field(self):
+        qs = WideTimeSeriesDateField.objects.order_by('pk')
+        for day in (1, 2, 3):
+            WideTimeSeriesDateField.objects.create(
+                date_ix=date(2024, 1, day), col1=day, col2=0, col3=0, col4=0)
+        for dtypes in (None, 'auto'):
+            df = qs.filter(col1__lt=3).to_dataframe(index='id', dtypes=dtypes)
+            refreshed = qs.refresh_dataframe(df, updated_field='date_ix',
+                                             dtypes=dtypes)
+            tm.assert_frame_equal(refreshed,
+                                  qs.to_dataframe(index='id', dtypes=dtypes))
+            self.assertEqual(refreshed.attrs['high_water_mark'],
+                             date(2024, 1, 3))
+
 
 if django.VERSION < (1, 9):
 
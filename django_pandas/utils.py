@@ -1,8 +1,27 @@
 # coding: utf-8
+import hashlib
+import pickle
 import sys
-
-from django.core.cache import cache
-from django.db.models import Field
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.core.signals import setting_changed
+from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Field, F, Q, Case, When, Value, CharField
+from django.db.models.constants import LOOKUP_SEP
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django.utils.translation import get_language
 
 if sys.version_info >= (3, ):
     from django.utils.encoding import force_str as force_text
@@ -18,11 +37,45 @@ def get_model_name(model):
 
 
 def replace_from_choices(choices):
+    """
+    Returns a function rendering an array of raw choice values as a
+    ``pandas.Categorical`` of their labels.
+
+    The values are matched against the choices in a single vectorized
+    lookup and the categorical is built straight from the resulting codes.
+    Values which are not valid choices are kept as they are.
+    """
+    keys = pd.Index(list(choices))
+    label_codes, labels = pd.factorize(pd.Index(list(choices.values())))
+
     def inner(values):
-        return [choices.get(v, v) for v in values]
+        values = pd.Series(values)
+        indexer = keys.get_indexer(values)
+        codes = np.where(indexer >= 0, label_codes[indexer], -1)
+        categories = labels
+
+        missing = (indexer < 0) & values.notna().to_numpy()
+        if missing.any():
+            extra_codes, extra = pd.factorize(values[missing])
+            categories = labels.append(extra)
+            if not categories.is_unique:
+                return pd.Categorical([choices.get(v, v) for v in values])
+            codes[missing] = extra_codes + len(labels)
+
+        return pd.Categorical.from_codes(codes, categories=categories)
     return inner
 
 
+@lru_cache(maxsize=512)
+def compile_choices(field, language=None):
+    """
+    Returns the rendering function for a choices field. Renderers are
+    cached per field and language since labels may be translated.
+    """
+    return replace_from_choices(
+        dict([(k, force_text(v)) for k, v in field.flatchoices]))
+
+
 def get_base_cache_key(model):
     return 'pandas_%s_%s_%%s_rendering' % (
         model._meta.app_label, get_model_name(model))
@@ -32,43 +85,415 @@ def get_cache_key(obj):
     return get_base_cache_key(obj._meta.model) % obj.pk
 
 
+#: Defaults for the ``DJANGO_PANDAS_LABEL_CACHE`` setting
+LABEL_CACHE_DEFAULTS = {
+    # Dotted path to the class used to cache foreign key labels
+    'BACKEND': 'django_pandas.utils.LabelCache',
+    # Alias of the Django cache used as the shared tier
+    'CACHE': 'default',
+    # Number of labels and seconds they are kept in the in-process tier
+    'MAXSIZE': 10000,
+    'TIMEOUT': 60,
+    # Invalidate labels on post_save/post_delete of the rendered models
+    'AUTO_INVALIDATE': True,
+}
+
+
+class LabelCache(object):
+    """
+    Caches the labels of rendered foreign keys in two tiers: a bounded
+    in-process LRU whose entries expire after ``timeout`` seconds in front
+    of a Django cache.
+
+    The in-process tier saves a cache backend round trip per lookup. Since
+    it cannot be invalidated from other processes its entries are only
+    kept for a short time.
+    """
+
+    def __init__(self, maxsize=10000, timeout=60, alias='default'):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.alias = alias
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get_many(self, keys):
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._local.get(key)
+                if entry is None:
+                    continue
+                if entry[1] < now:
+                    del self._local[key]
+                    continue
+                self._local.move_to_end(key)
+                found[key] = entry[0]
+
+        misses = [key for key in keys if key not in found]
+        if misses:
+            shared = self.shared.get_many(misses)
+            self._set_local(shared)
+            found.update(shared)
+        return found
+
+    def set_many(self, mapping):
+        self.shared.set_many(mapping)
+        self._set_local(mapping)
+
+    def delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+        self.shared.delete(key)
+
+    def clear(self):
+        """Empties the in-process tier"""
+        with self._lock:
+            self._local.clear()
+
+    def _set_local(self, mapping):
+        if not self.maxsize:
+            return
+        expires = time.monotonic() + self.timeout
+        with self._lock:
+            for key, value in mapping.items():
+                self._local[key] = (value, expires)
+                self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+
+_label_cache = None
+
+
+def get_label_cache_settings():
+    conf = dict(LABEL_CACHE_DEFAULTS)
+    conf.update(getattr(settings, 'DJANGO_PANDAS_LABEL_CACHE', {}))
+    return conf
+
+
+def get_label_cache():
+    """
+    Returns the label cache configured by the ``DJANGO_PANDAS_LABEL_CACHE``
+    setting
+    """
+    global _label_cache
+    if _label_cache is None:
+        conf = get_label_cache_settings()
+        _label_cache = import_string(conf['BACKEND'])(
+            maxsize=conf['MAXSIZE'], timeout=conf['TIMEOUT'],
+            alias=conf['CACHE'])
+    return _label_cache
+
+
+@receiver(setting_changed)
+def reset_label_cache(setting, **kwargs):
+    global _label_cache
+    if setting in ('DJANGO_PANDAS_LABEL_CACHE', 'CACHES'):
+        _label_cache = None
+
+
 def invalidate(obj):
-    cache.delete(get_cache_key(obj))
+    get_label_cache().delete(get_cache_key(obj))
 
 
 def invalidate_signal_handler(sender, **kwargs):
     invalidate(kwargs['instance'])
 
 
-def replace_pk(model):
-    base_cache_key = get_base_cache_key(model)
+def register_invalidation(model):
+    """
+    Connects ``invalidate_signal_handler`` to the ``post_save`` and
+    ``post_delete`` signals of ``model`` so cached labels of its instances
+    are dropped when they change. Connecting the same model twice is a
+    no-op.
+    """
+    dispatch_uid = 'django_pandas_invalidate_%s' % model._meta.label_lower
+    post_save.connect(invalidate_signal_handler, sender=model, weak=False,
+                      dispatch_uid=dispatch_uid)
+    post_delete.connect(invalidate_signal_handler, sender=model, weak=False,
+                        dispatch_uid=dispatch_uid)
 
-    def get_cache_key_from_pk(pk):
-        if pk is None:
-            return None
-        else:
-            try:
-                return base_cache_key % str(int(pk))
-            except:
-                return base_cache_key % str(pk)
 
-    def inner(pk_series):
-        pk_series = pk_series.astype(object).where(pk_series.notnull(), None)
-        cache_keys = pk_series.apply(get_cache_key_from_pk)
-        unique_cache_keys = list(filter(None, cache_keys.unique()))
+FRAME_VERSION_KEY = 'django_pandas:frame_version:%s'
+FRAME_KEY = 'django_pandas:frame:%s'
+
+#: Aliases of the caches holding frames, whose versions are bumped when
+#: a tagged model changes
+_frame_cache_aliases = set()
+#: Whether the version handlers are connected for every model (see
+#: ``register_frame_caches``)
+_frame_invalidation_connected = False
+
+
+def get_lookup_models(model, lookup):
+    """
+    Returns the models the ``__`` separated ``lookup`` spans from
+    ``model``, including the intermediate models of many-to-many
+    relations. Parts which are not fields (e.g. annotations or transforms)
+    end the walk.
+    """
+    models = []
+    for part in lookup.split(LOOKUP_SEP):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation or field.related_model is None:
+            break
+        through = getattr(field.remote_field, 'through', None) or \
+            getattr(field, 'through', None)
+        if through is not None:
+            models.append(through)
+        model = field.related_model
+        models.append(model)
+    return models
+
+
+def iter_lookups(values):
+    """
+    Yields the strings in ``values`` and in the lists, tuples and
+    dictionaries it holds, e.g. the arguments of a ``DataFrameQuerySet``
+    method
+    """
+    for value in values:
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, dict):
+            for lookup in iter_lookups(list(value) + list(value.values())):
+                yield lookup
+        elif isinstance(value, (list, tuple)):
+            for lookup in iter_lookups(value):
+                yield lookup
+
+
+def get_query_models(query, lookups=()):
+    """
+    Returns the models a query reads from: the models of the tables it
+    joins, the models spanned by ``lookups`` (the field names the frame is
+    built from, which add their own joins) and the models their foreign
+    keys point to, whose labels verbose rendering looks up
+    """
+    tables = set(query.alias_map[alias].table_name
+                 for alias in query.alias_map)
+    # The alias map of an unfiltered query is empty until it is compiled
+    models = set([query.model])
+    models.update(model for model in apps.get_models(include_auto_created=True)
+                  if model._meta.db_table in tables)
+    for lookup in lookups:
+        models.update(get_lookup_models(query.model, lookup))
+    for model in list(models):
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.related_model is not None:
+                models.add(field.related_model)
+    return sorted(models, key=lambda m: m._meta.label_lower)
+
+
+def new_version():
+    return time.time_ns()
+
+
+def get_model_versions(models, cache):
+    """
+    Returns the current frame version of each model, initialising missing
+    (e.g. evicted) versions to a new unique value so that frames stored
+    under an older version are never served again
+    """
+    keys = [FRAME_VERSION_KEY % m._meta.label_lower for m in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_model_version(model):
+    """
+    Invalidates every cached frame tagged with ``model``
+    """
+    key = FRAME_VERSION_KEY % model._meta.label_lower
+    for alias in _frame_cache_aliases:
+        cache = caches[alias]
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_version(), timeout=None)
+
+
+def frame_version_handler(sender, **kwargs):
+    bump_model_version(sender)
 
-        if not unique_cache_keys:
-            return pk_series
 
-        out_dict = cache.get_many(unique_cache_keys)
+def frame_m2m_handler(sender, action, instance, model, **kwargs):
+    if action.startswith('post_'):
+        for changed in (sender, instance.__class__, model):
+            bump_model_version(changed)
+
+
+def register_frame_invalidation(model):
+    """
+    Connects ``frame_version_handler`` to the ``post_save`` and
+    ``post_delete`` signals of ``model`` and ``frame_m2m_handler`` to
+    ``m2m_changed``. Connecting the same model twice is a no-op.
+    """
+    dispatch_uid = 'django_pandas_frame_version_%s' % model._meta.label_lower
+    post_save.connect(frame_version_handler, sender=model, weak=False,
+                      dispatch_uid=dispatch_uid)
+    post_delete.connect(frame_version_handler, sender=model, weak=False,
+                        dispatch_uid=dispatch_uid)
+    m2m_changed.connect(frame_m2m_handler, weak=False,
+                        dispatch_uid='django_pandas_frame_m2m')
+
+
+def register_frame_caches(aliases):
+    """
+    Connects the version handlers for every model and bumps versions in the
+    caches ``aliases`` from now on, whether or not this process reads cached
+    frames. Called when the app is ready with the
+    ``DJANGO_PANDAS_FRAME_CACHES`` setting.
+    """
+    global _frame_invalidation_connected
+    if not aliases:
+        return
+    _frame_cache_aliases.update(aliases)
+    post_save.connect(frame_version_handler, weak=False,
+                      dispatch_uid='django_pandas_frame_version')
+    post_delete.connect(frame_version_handler, weak=False,
+                        dispatch_uid='django_pandas_frame_version')
+    m2m_changed.connect(frame_m2m_handler, weak=False,
+                        dispatch_uid='django_pandas_frame_m2m')
+    _frame_invalidation_connected = True
+
+
+#: Pickle protocol of cached frames. Protocol 5 (Python 3.8 and later)
+#: keeps the column buffers out-of-band; older Pythons fall back to 4
+FRAME_PICKLE_PROTOCOL = min(5, pickle.HIGHEST_PROTOCOL)
+
+
+def dumps_frame(df):
+    """
+    Serializes a DataFrame with ``FRAME_PICKLE_PROTOCOL``. With protocol 5
+    the column buffers are kept out-of-band so they are stored as raw bytes
+    """
+    if FRAME_PICKLE_PROTOCOL < 5:
+        return pickle.dumps(df, protocol=FRAME_PICKLE_PROTOCOL), []
+    buffers = []
+    payload = pickle.dumps(df, protocol=5, buffer_callback=buffers.append)
+    return payload, [bytearray(buffer.raw()) for buffer in buffers]
+
 
-        if len(out_dict) < len(unique_cache_keys):
-            out_dict = dict([(base_cache_key % obj.pk, force_text(obj))
-                            for obj in model.objects.filter(
-                            pk__in=list(filter(None, pk_series.unique())))])
-            cache.set_many(out_dict)
+def loads_frame(value):
+    payload, buffers = value
+    if not buffers:
+        return pickle.loads(payload)
+    return pickle.loads(payload, buffers=buffers)
 
-        return list(map(out_dict.get, cache_keys))
+
+def get_frame_cache_key(qs, name, args, kwargs, versions):
+    sql, params = qs.query.sql_with_params()
+    key = repr((qs.db, name, sql, params, args, sorted(kwargs.items()),
+                get_language(), versions))
+    return FRAME_KEY % hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def get_or_build_frame(qs, name, args, kwargs, build, timeout, alias):
+    """
+    Returns the frame built by ``build()`` for the QuerySet method ``name``
+    called with ``args`` and ``kwargs`` from the cache ``alias``, building
+    and storing it for ``timeout`` seconds on a miss.
+
+    Entries are keyed by the compiled SQL, its parameters, the read options
+    and the versions of every model the query, and the field names among
+    ``args`` and ``kwargs``, read from. Saving, deleting
+    or changing the many-to-many relations of one of those models bumps its
+    version, so stale entries are never read again and simply expire.
+    Unless ``register_frame_caches`` connected them for every model, the
+    version handlers are connected here for the models read.
+    """
+    try:
+        lookups = iter_lookups(list(args) + list(kwargs.values()))
+        models = get_query_models(qs.query, lookups)
+        cache = caches[alias]
+        _frame_cache_aliases.add(alias)
+        if not _frame_invalidation_connected:
+            for model in models:
+                register_frame_invalidation(model)
+        key = get_frame_cache_key(qs, name, args, kwargs,
+                                  get_model_versions(models, cache))
+    except EmptyResultSet:
+        return build()
+
+    value = cache.get(key)
+    if value is not None:
+        return loads_frame(value)
+    df = build()
+    cache.set(key, dumps_frame(df), timeout)
+    return df
+
+
+#: Maximum number of primary keys looked up per query when rendering
+#: foreign keys (kept below SQLite's limit on query parameters)
+VERBOSE_BATCH_SIZE = 500
+
+
+def replace_pk(model, categorical=False):
+    """
+    Returns a function rendering an array of primary keys of ``model`` as
+    the string representation of the matching instances.
+
+    Only the unique keys are looked up: first in the label cache (see
+    ``LabelCache``) and then, for the cache misses only, in the database in
+    batches of
+    ``VERBOSE_BATCH_SIZE``. If ``categorical`` is True the labels are
+    returned as a ``pandas.Categorical``.
+    """
+    base_cache_key = get_base_cache_key(model)
+    if get_label_cache_settings()['AUTO_INVALIDATE']:
+        register_invalidation(model)
+
+    def get_cache_key_from_pk(pk):
+        if isinstance(pk, float):
+            pk = int(pk)
+        return base_cache_key % pk
+
+    def inner(pk_series):
+        codes, uniques = pd.factorize(pk_series)
+        if not len(uniques):
+            return pk_series.astype(object).where(pk_series.notnull(), None)
+
+        cache_keys = [get_cache_key_from_pk(pk) for pk in uniques]
+        label_cache = get_label_cache()
+        cached = label_cache.get_many(cache_keys)
+        labels = np.array([cached.get(key) for key in cache_keys] + [None],
+                          dtype=object)
+
+        missing = [i for i, key in enumerate(cache_keys) if key not in cached]
+        if missing:
+            found = {}
+            for start in range(0, len(missing), VERBOSE_BATCH_SIZE):
+                pks = [uniques[i]
+                       for i in missing[start:start + VERBOSE_BATCH_SIZE]]
+                found.update((obj.pk, force_text(obj))
+                             for obj in model.objects.filter(pk__in=pks))
+            out_dict = {}
+            for i in missing:
+                labels[i] = found.get(uniques[i])
+                if labels[i] is not None:
+                    out_dict[cache_keys[i]] = labels[i]
+            label_cache.set_many(out_dict)
+
+        # Missing keys have code -1 and pick the trailing None
+        if categorical:
+            label_codes, categories = pd.factorize(labels)
+            return pd.Categorical.from_codes(label_codes.take(codes),
+                                             categories=categories)
+        return labels.take(codes)
 
     return inner
 
@@ -79,20 +504,460 @@ def build_update_functions(fieldnames, fields):
             yield fieldname, None
         else:
             if field and field.choices:
-                choices = dict([(k, force_text(v))
-                                for k, v in field.flatchoices])
-                yield fieldname, replace_from_choices(choices)
+                yield fieldname, compile_choices(field, get_language())
 
             elif field and field.get_internal_type() == 'ForeignKey':
                 yield fieldname, replace_pk(get_related_model(field))
 
 
+def is_verbose_field(field):
+    """
+    Returns True if the values of ``field`` are replaced by human readable
+    labels when a frame is read with ``verbose=True``
+    """
+    return isinstance(field, Field) and bool(
+        field.choices or field.get_internal_type() == 'ForeignKey')
+
+
+INTEGER_FIELDS = (
+    'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField',
+    'BigIntegerField', 'SmallIntegerField', 'PositiveIntegerField',
+    'PositiveBigIntegerField', 'PositiveSmallIntegerField',
+)
+
+STRING_FIELDS = (
+    'CharField', 'TextField', 'EmailField', 'SlugField', 'URLField',
+    'FilePathField', 'GenericIPAddressField', 'IPAddressField',
+)
+
+
+def string_dtype():
+    """
+    Returns the pandas string dtype, backed by pyarrow when it is installed
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return 'string'
+    return 'string[pyarrow]'
+
+
+def get_field_dtype(field):
+    """
+    Returns the pandas dtype used for the raw values of a model field or
+    None if the dtype should be left to pandas to infer
+    """
+    if not isinstance(field, Field):
+        return None
+
+    internal_type = field.get_internal_type()
+    if internal_type in ('ForeignKey', 'OneToOneField'):
+        return get_field_dtype(field.target_field)
+    if internal_type in INTEGER_FIELDS:
+        return 'Int64'
+    if internal_type in ('BooleanField', 'NullBooleanField'):
+        return 'boolean'
+    if internal_type == 'DateTimeField':
+        return 'datetime64[ns, UTC]' if settings.USE_TZ else 'datetime64[ns]'
+    if internal_type == 'DateField':
+        return 'datetime64[ns]'
+    if internal_type in ('FloatField', 'DecimalField'):
+        return 'float64'
+    if internal_type in STRING_FIELDS:
+        return string_dtype()
+    return None
+
+
+#: Integer dtypes ``get_downcast_dtype`` chooses from, narrowest first
+DOWNCAST_INTEGER_DTYPES = ('int8', 'int16', 'int32', 'int64')
+
+
+def get_integer_bounds(field, connection=None):
+    """
+    Returns the smallest and largest value ``field`` accepts according to
+    the range of its column on ``connection`` (the default database if not
+    given), its validators and its choices. Either bound is None when
+    unknown, e.g. on SQLite whose integer columns all hold 64-bit values.
+    """
+    if connection is None:
+        connection = connections[DEFAULT_DB_ALIAS]
+    try:
+        low, high = connection.ops.integer_field_range(
+            field.get_internal_type())
+    except KeyError:
+        low, high = None, None
+    for validator in field.validators:
+        limit = getattr(validator, 'limit_value', None)
+        if callable(limit) or not isinstance(limit, (int, float)):
+            continue
+        if isinstance(validator, MinValueValidator):
+            low = limit if low is None else max(low, limit)
+        elif isinstance(validator, MaxValueValidator):
+            high = limit if high is None else min(high, limit)
+
+    keys = [key for key, _ in field.flatchoices]
+    if keys and all(isinstance(key, int) for key in keys):
+        low = min(keys) if low is None else max(low, min(keys))
+        high = max(keys) if high is None else min(high, max(keys))
+    return low, high
+
+
+def get_downcast_dtype(field, floats=False, null=False, connection=None):
+    """
+    Returns the narrowest pandas dtype holding every value of a model field,
+    derived from the range of its column on ``connection`` (see
+    ``get_integer_bounds``), its validators and its choices rather than
+    from the data, or None if the field is not numeric. Integers are
+    ``int64`` unless bounded.
+
+    Nullable integer and boolean fields, and any field when ``null`` is
+    True (e.g. reached through a nullable relation), get the masked
+    ``Int8`` ... ``Int64`` and ``boolean`` dtypes. ``FloatField`` columns
+    are only narrowed to ``float32`` if ``floats`` is True.
+    """
+    if not isinstance(field, Field):
+        return None
+    null = null or field.null
+
+    target = field
+    if field.get_internal_type() in ('ForeignKey', 'OneToOneField'):
+        target = field.target_field
+    internal_type = target.get_internal_type()
+    if internal_type in INTEGER_FIELDS:
+        low, high = get_integer_bounds(target, connection)
+        dtype = 'int64'
+        if low is not None and high is not None:
+            for name in DOWNCAST_INTEGER_DTYPES:
+                info = np.iinfo(name)
+                if info.min <= low and high <= info.max:
+                    dtype = name
+                    break
+        return dtype.capitalize() if null else dtype
+    if internal_type in ('BooleanField', 'NullBooleanField'):
+        return 'boolean' if null or \
+            internal_type == 'NullBooleanField' else 'bool'
+    if internal_type == 'FloatField':
+        return 'float32' if floats else 'float64'
+    return None
+
+
+def get_arrow_type(field, verbose=False):
+    """
+    Returns the pyarrow type of the values of a model field, a dictionary
+    of strings for the labels of verbose fields when ``verbose`` is True,
+    or None if the type should be left to pyarrow to infer
+    """
+    import pyarrow as pa
+
+    if not isinstance(field, Field):
+        return None
+    if verbose and is_verbose_field(field):
+        return pa.dictionary(pa.int32(), pa.string())
+
+    internal_type = field.get_internal_type()
+    if internal_type in ('ForeignKey', 'OneToOneField'):
+        return get_arrow_type(field.target_field)
+    if internal_type in INTEGER_FIELDS:
+        return pa.int64()
+    if internal_type in ('BooleanField', 'NullBooleanField'):
+        return pa.bool_()
+    if internal_type == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC' if settings.USE_TZ else None)
+    if internal_type == 'DateField':
+        return pa.date32()
+    if internal_type == 'TimeField':
+        return pa.time64('us')
+    if internal_type == 'DurationField':
+        return pa.duration('us')
+    if internal_type == 'DecimalField':
+        decimal = pa.decimal128 if field.max_digits <= 38 else pa.decimal256
+        return decimal(field.max_digits, field.decimal_places)
+    if internal_type == 'FloatField':
+        return pa.float64()
+    if internal_type in STRING_FIELDS:
+        return pa.string()
+    return None
+
+
+def arrow_labels(array, field):
+    """
+    Renders an Arrow array of raw foreign key or choice values of ``field``
+    as a dictionary array of their labels.
+
+    Only the dictionary of unique values is rendered (see ``replace_pk``)
+    and the indices are remapped so that equal labels share one entry.
+    """
+    import pyarrow as pa
+
+    encoded = array.dictionary_encode()
+    uniques = pd.Series(encoded.dictionary.to_pylist(), dtype=object)
+    if field.choices:
+        choices = dict((k, force_text(v)) for k, v in field.flatchoices)
+        labels = np.array([choices.get(v, force_text(v)) for v in uniques],
+                          dtype=object)
+    else:
+        labels = replace_pk(get_related_model(field))(uniques)
+    label_codes, categories = pd.factorize(labels)
+
+    # Null values and keys without a label get the trailing -1
+    label_codes = np.append(label_codes, -1).astype('int32')
+    indices = encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+    indices = label_codes[indices]
+    return pa.DictionaryArray.from_arrays(
+        pa.array(indices, mask=indices < 0, type=pa.int32()),
+        pa.array(categories, type=pa.string()))
+
+
+def cast_series(series, dtype):
+    """
+    Converts ``series`` to ``dtype``, parsing dates and times where needed
+    """
+    dtype = pd.api.types.pandas_dtype(dtype)
+    if series.dtype == dtype:
+        return series
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return pd.to_datetime(series, utc=True).dt.tz_convert(dtype.tz)
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return pd.to_datetime(series).astype(dtype)
+    if dtype.kind == 'i' and dtype.itemsize < 8:
+        # NumPy wraps values which do not fit around, cast through the
+        # masked dtype which refuses to
+        nullable = pd.api.types.pandas_dtype(dtype.name.capitalize())
+        return series.astype(nullable).astype(dtype)
+    return series.astype(dtype)
+
+
+def prefix_expression(expression, prefix):
+    """
+    Returns a copy of ``expression`` with every field reference prefixed
+    by ``prefix`` so that it can be evaluated across a relationship
+    """
+    if isinstance(expression, F):
+        return F('%s__%s' % (prefix, expression.name))
+    if isinstance(expression, Q):
+        q = expression.copy()
+        q.children = [
+            prefix_expression(child, prefix) if isinstance(child, Q)
+            else ('%s__%s' % (prefix, child[0]),
+                  prefix_expression(child[1], prefix))
+            for child in expression.children
+        ]
+        return q
+    if not hasattr(expression, 'get_source_expressions'):
+        return expression
+    expression = expression.copy()
+    expression.set_source_expressions([
+        prefix_expression(e, prefix)
+        for e in expression.get_source_expressions()
+    ])
+    return expression
+
+
+@lru_cache(maxsize=1024)
+def get_label_expression(field, fieldname):
+    """
+    Returns an expression selecting the label of the instance referenced
+    by the foreign key ``field`` (selected as ``fieldname``) or None if
+    the related model does not declare a ``pandas_label``.
+
+    ``pandas_label`` is an ORM expression, or a field name, relative to
+    the related model e.g. ``Concat('symbol', Value(' '), 'isin')``.
+    """
+    expression = getattr(get_related_model(field), 'pandas_label', None)
+    if expression is None:
+        return None
+    if isinstance(expression, str):
+        expression = F(expression)
+    return Case(
+        When(**{'%s__isnull' % fieldname: True},
+             then=Value(None, output_field=CharField())),
+        default=prefix_expression(expression, fieldname),
+        output_field=CharField(),
+    )
+
+
+@lru_cache(maxsize=1024)
+def cached_update_functions(fieldnames, fields, language=None):
+    """
+    Returns the ``(fieldname, function)`` pairs of the columns which are
+    rendered by ``update_with_verbose``. Cached per columns and language.
+    """
+    return tuple((fieldname, function) for fieldname, function
+                 in build_update_functions(fieldnames, fields)
+                 if function is not None)
+
+
 def update_with_verbose(df, fieldnames, fields):
-    for fieldname, function in build_update_functions(fieldnames, fields):
+    try:
+        functions = cached_update_functions(
+            tuple(fieldnames), tuple(fields), get_language())
+    except TypeError:  # unhashable field names
+        functions = build_update_functions(fieldnames, fields)
+    for fieldname, function in functions:
         if function is not None:
             df[fieldname] = function(df[fieldname])
 
 
+def long_to_wide(df, index, columns, values, aggfunc=None, multiindex=False):
+    """
+    Reshapes a long frame into a wide one indexed by the unique values of
+    ``index`` with a column per unique combination of ``columns``.
+
+    The index and the pivot keys are factorized separately and the values
+    are scattered into a preallocated 2-D array, so no per row strings or
+    temporary columns are created.
+
+    Parameters
+    ----------
+
+    columns: A column name or a list of column names. With a list the
+             columns are labelled by the upper cased keys and the lower
+             cased ``values`` name joined by ``'.'`` (e.g. ``'GDP.value'``)
+             unless ``multiindex`` is True.
+
+    aggfunc: How to combine values sharing an index and a key: one of
+             ``'sum'``, ``'mean'``, ``'count'``, ``'min'``, ``'max'``,
+             ``'first'`` or ``'last'``. If None duplicates raise a
+             ``ValueError`` like ``DataFrame.pivot``.
+
+    multiindex: Label the columns with a ``MultiIndex`` of the keys
+                instead of concatenated strings.
+    """
+    keys = list(columns) if isinstance(columns, (tuple, list)) else [columns]
+
+    index_codes, index_uniques = pd.factorize(df[index], sort=True)
+    column_codes = np.zeros(len(df), dtype=np.int64)
+    valid = index_codes >= 0
+    key_uniques = []
+    for key in keys:
+        codes, uniques = pd.factorize(df[key], sort=True)
+        if isinstance(uniques.dtype, pd.CategoricalDtype):
+            # Label the columns with the values, not a CategoricalIndex
+            uniques = uniques.astype(uniques.dtype.categories.dtype)
+        valid &= codes >= 0
+        column_codes = column_codes * len(uniques) + codes
+        key_uniques.append(uniques)
+    column_codes, observed = pd.factorize(column_codes[valid], sort=True)
+    index_codes = index_codes[valid]
+    data = df[values].to_numpy()[valid]
+
+    n_rows, n_cols = len(index_uniques), len(observed)
+    flat = index_codes * n_cols + column_codes
+    numeric = pd.api.types.is_numeric_dtype(data.dtype)
+    if numeric:
+        data = data.astype(np.float64)
+        notnull = ~np.isnan(data)
+    else:
+        notnull = pd.notnull(data)
+    out = np.full(n_rows * n_cols, np.nan, dtype=np.float64 if numeric
+                  else object)
+
+    if aggfunc is None:
+        if len(np.unique(flat)) < len(flat):
+            raise ValueError('Index contains duplicate entries, '
+                             'cannot reshape')
+        out[flat] = data
+    elif aggfunc in ('first', 'last'):
+        step = -1 if aggfunc == 'first' else 1
+        out[flat[notnull][::step]] = data[notnull][::step]
+    elif aggfunc in ('sum', 'mean', 'count'):
+        present = np.bincount(flat, minlength=len(out)) > 0
+        counts = np.bincount(flat[notnull], minlength=len(out))
+        if aggfunc == 'count':
+            out = counts.astype(np.float64)
+        else:
+            out = np.bincount(flat[notnull], weights=data[notnull],
+                              minlength=len(out))
+            if aggfunc == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    out = out / counts
+        out[~present] = np.nan
+    elif aggfunc in ('min', 'max'):
+        ufunc = np.fmin if aggfunc == 'min' else np.fmax
+        ufunc.at(out, flat, data)
+    else:
+        raise ValueError('Unsupported aggfunc %r' % (aggfunc,))
+    out = out.reshape(n_rows, n_cols)
+
+    # Decode the observed combinations into the codes of each key
+    level_codes = []
+    for uniques in reversed(key_uniques):
+        observed, codes = np.divmod(observed, len(uniques))
+        level_codes.insert(0, codes)
+    levels = [uniques.take(codes)
+              for uniques, codes in zip(key_uniques, level_codes)]
+
+    if multiindex or len(keys) == 1 and not isinstance(columns, (tuple,
+                                                                 list)):
+        if len(keys) == 1:
+            header = pd.Index(levels[0], name=keys[0])
+        else:
+            header = pd.MultiIndex.from_arrays(levels, names=keys)
+    else:
+        labels = np.array(['.'.join(
+            [str(level[i]).upper() for level in levels] + [values.lower()])
+            for i in range(n_cols)], dtype=object)
+        order = np.argsort(labels, kind='stable')
+        out = out[:, order]
+        header = pd.Index(labels[order], name='combined_keys')
+
+    return pd.DataFrame(out, index=pd.Index(index_uniques, name=index),
+                        columns=header)
+
+
+def get_pks_from_labels(model, labels):
+    """
+    Returns a dictionary mapping the labels verbose rendering gives
+    instances of ``model`` back to their primary keys. Labels shared by
+    several instances raise a ``ValueError``.
+
+    Models declaring a ``pandas_label`` expression are filtered on it in
+    batches. For other models the labels are first looked up in each
+    string field, as ``__str__`` usually renders one of them, and only the
+    labels still missing are searched for by rendering every instance.
+    """
+    labels = list(dict.fromkeys(labels))
+    found = {}
+
+    def add(label, pk):
+        if found.setdefault(label, pk) != pk:
+            raise ValueError('Ambiguous %s label %r: several instances are '
+                             'rendered as it' % (model._meta.label, label))
+
+    def batches(qs, lookup):
+        for start in range(0, len(labels), VERBOSE_BATCH_SIZE):
+            yield qs.filter(**{
+                lookup: labels[start:start + VERBOSE_BATCH_SIZE]})
+
+    expression = getattr(model, 'pandas_label', None)
+    if expression is not None:
+        if isinstance(expression, str):
+            expression = F(expression)
+        qs = model.objects.annotate(pandas_label_value=expression)
+        for batch in batches(qs, 'pandas_label_value__in'):
+            for label, pk in batch.values_list('pandas_label_value', 'pk'):
+                add(label, pk)
+        return found
+
+    wanted = set(labels)
+    for field in model._meta.concrete_fields:
+        if field.get_internal_type() not in STRING_FIELDS:
+            continue
+        for batch in batches(model.objects.all(), field.name + '__in'):
+            for obj in batch:
+                label = force_text(obj)
+                if label in wanted:
+                    add(label, obj.pk)
+
+    missing = wanted.difference(found)
+    if missing:
+        for obj in model.objects.iterator():
+            label = force_text(obj)
+            if label in missing:
+                add(label, obj.pk)
+    return found
+
+
 def get_related_model(field):
     """Gets the related model from a related field"""
     model = None